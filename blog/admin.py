@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Post, Category, Tag, Comment
+from django.utils import timezone
+from .models import Post, Category, Tag, Comment, Job
 # Register your models here.
 
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,7 +9,19 @@ class CategoryAdmin(admin.ModelAdmin):
 class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name', )}
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'args', 'status', 'priority', 'attempts', 'run_after', 'created')
+    list_filter = ('status', 'name')
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        # 같은 key 의 job 이 이미 대기 중이면 그대로 둔다.
+        pending = Job.objects.filter(status=Job.PENDING, key__isnull=False).values('key')
+        queryset.filter(status=Job.FAILED).exclude(key__in=pending).update(status=Job.PENDING, attempts=0, run_after=timezone.now())
+    retry.short_description = 'Retry selected failed jobs'
+
 admin.site.register(Post)
 admin.site.register(Comment)
 admin.site.register(Category, CategoryAdmin)
-admin.site.register(Tag, TagAdmin)
\ No newline at end of file
+admin.site.register(Tag, TagAdmin)
+admin.site.register(Job, JobAdmin)
\ No newline at end of file
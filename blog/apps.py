@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class BlogConfig(AppConfig):
     name = 'blog'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from my_site_prj.db import configure_sqlite
+        from . import checks, signals
+        from .metrics import install_query_wrapper
+        connection_created.connect(configure_sqlite, dispatch_uid='blog.configure_sqlite')
+        connection_created.connect(install_query_wrapper, dispatch_uid='blog.install_query_wrapper')
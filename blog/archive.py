@@ -0,0 +1,235 @@
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Post, Category, Tag, Comment
+
+# JSON Lines 백업 형식. 한 줄에 하나씩, 참조되는 쪽이 먼저 나온다.
+#   {"type": "category", "slug", "name", "description"}
+#   {"type": "tag", "slug", "name"}
+#   {"type": "post", "id", "title", "content", "head_image", "created", "modified",
+#    "author", "category", "tags"}       (author 는 username, category/tags 는 slug)
+#   {"type": "comment", "id", "post", "author", "text", "created_at", "modified_at"}
+# head_image 는 MEDIA_ROOT 기준 경로만 담는다 (파일은 _media/ 를 따로 옮긴다).
+
+ORDER = ('category', 'tag', 'post', 'comment')
+
+# bulk_create 가 현재 시각으로 덮어쓰는 auto_now(_add) field
+TIMESTAMP_FIELDS = {
+    Post: ('created', 'modified'),
+    Comment: ('created_at', 'modified_at'),
+}
+
+
+@contextmanager
+def explicit_timestamps(manager, objects):
+    """
+    with 안에서 objects 를 bulk_create 하면 created / modified 를 지정한 값 그대로 남긴다 (가져오기, 벤치마크 데이터).
+    들어올 때 값을 기억해 두었다가 나갈 때 bulk_update (QuerySet.update) 로 되돌린다.
+    bulk_create 후 pk 가 채워지지 않는 DB(sqlite)에서는 with 안에서 pk 를 채워야 한다.
+    """
+    fields = TIMESTAMP_FIELDS[manager.model]
+    values = [[getattr(obj, name) for name in fields] for obj in objects]
+    yield
+    for obj, row in zip(objects, values):
+        for name, value in zip(fields, row):
+            setattr(obj, name, value)
+    manager.bulk_update(objects, fields)
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _keyset(queryset, fields, batch_size):
+    # pk 순서로 batch_size 씩 (iterator() 와 달리 DB cursor 를 오래 잡고 있지 않는다)
+    last = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last).order_by('pk').values(*fields)[:batch_size])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]['pk']
+
+
+def export_records(using='default', batch_size=1000):
+    for row in Category.objects.using(using).order_by('pk').values('slug', 'name', 'description').iterator():
+        yield dict(type='category', **row)
+    for row in Tag.objects.using(using).order_by('pk').values('slug', 'name').iterator():
+        yield dict(type='tag', **row)
+
+    PostTag = Post.tags.through
+    posts = Post.objects.using(using)
+    fields = ('pk', 'title', 'content', 'head_image', 'created', 'modified', 'author__username', 'category__slug')
+    for rows in _keyset(posts, fields, batch_size):
+        tags = {}
+        for post_id, slug in (PostTag.objects.using(using).filter(post_id__in=[row['pk'] for row in rows])
+                              .order_by('pk').values_list('post_id', 'tag__slug')):
+            tags.setdefault(post_id, []).append(slug)
+        for row in rows:
+            yield {
+                'type': 'post',
+                'id': row['pk'],
+                'title': row['title'],
+                'content': row['content'],
+                'head_image': row['head_image'],
+                'created': _date(row['created']),
+                'modified': _date(row['modified']),
+                'author': row['author__username'],
+                'category': row['category__slug'],
+                'tags': tags.get(row['pk'], []),
+            }
+
+    comments = Comment.objects.using(using)
+    fields = ('pk', 'post_id', 'author__username', 'text', 'created_at', 'modified_at')
+    for rows in _keyset(comments, fields, batch_size):
+        for row in rows:
+            yield {
+                'type': 'comment',
+                'id': row['pk'],
+                'post': row['post_id'],
+                'author': row['author__username'],
+                'text': row['text'],
+                'created_at': _date(row['created_at']),
+                'modified_at': _date(row['modified_at']),
+            }
+
+
+def write_records(records, stream):
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+class Importer:
+    """
+    JSON Lines 를 한 줄씩 읽어서 종류별로 batch_size 만큼 모았다가 bulk_create 한다.
+    save()/signal 을 거치지 않으므로 Markdown 렌더링, 개수, 검색 색인, 캐시는
+    finish() 에서 한 번에 처리한다 (blog/management/commands/import_blog.py).
+    메모리에는 현재 batch 와 slug/username -> pk map 만 남는다.
+    Post/Comment 의 id 는 그대로 쓰므로 같은 id 가 이미 있으면 IntegrityError 가 난다.
+    """
+
+    def __init__(self, using='default', batch_size=1000):
+        self.using = using
+        self.batch_size = batch_size
+        self.categories = dict(Category.objects.using(using).values_list('slug', 'pk'))
+        self.tags = dict(Tag.objects.using(using).values_list('slug', 'pk'))
+        self.authors = {}
+        self.pending = {kind: [] for kind in ORDER}
+        self.counts = {kind: 0 for kind in ORDER}
+        self.creators = {
+            'category': self.create_categories,
+            'tag': self.create_tags,
+            'post': self.create_posts,
+            'comment': self.create_comments,
+        }
+
+    def add(self, record):
+        kind = record['type']
+        if kind not in self.pending:
+            raise ValueError('Unknown record type: {!r}'.format(kind))
+        self.pending[kind].append(record)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind=None):
+        # 참조되는 쪽(category, tag -> post -> comment)을 먼저 넣는다.
+        for name in ORDER[:ORDER.index(kind) + 1] if kind else ORDER:
+            records = self.pending[name]
+            if records:
+                with transaction.atomic(using=self.using):
+                    self.creators[name](records)
+                self.counts[name] += len(records)
+                self.pending[name] = []
+
+    def author_id(self, username):
+        if username not in self.authors:
+            user, created = User.objects.db_manager(self.using).get_or_create(username=username)
+            if created:
+                user.set_unusable_password()
+                user.save(using=self.using, update_fields=['password'])
+            self.authors[username] = user.pk
+        return self.authors[username]
+
+    def create_categories(self, records):
+        self._create_slugged(Category, self.categories, [
+            Category(slug=r['slug'], name=r['name'], description=r.get('description', ''))
+            for r in records if r['slug'] not in self.categories
+        ])
+
+    def create_tags(self, records):
+        self._create_slugged(Tag, self.tags, [
+            Tag(slug=r['slug'], name=r['name']) for r in records if r['slug'] not in self.tags
+        ])
+
+    def _create_slugged(self, model, slug_map, objects):
+        if not objects:
+            return
+        model.objects.using(self.using).bulk_create(objects)
+        # sqlite 에서는 bulk_create 후 pk 가 채워지지 않는다.
+        slug_map.update(model.objects.using(self.using)
+                        .filter(slug__in=[obj.slug for obj in objects]).values_list('slug', 'pk'))
+
+    def create_posts(self, records):
+        posts = []
+        post_tags = []
+        for r in records:
+            posts.append(Post(
+                pk=r['id'],
+                title=r['title'],
+                content=r['content'],
+                head_image=r.get('head_image') or '',
+                created=parse_datetime(r['created']),
+                modified=parse_datetime(r.get('modified') or r['created']),
+                author_id=self.author_id(r['author']),
+                category_id=self.categories[r['category']] if r.get('category') else None,
+            ))
+            post_tags += [Post.tags.through(post_id=r['id'], tag_id=self.tags[slug]) for slug in r.get('tags', [])]
+        manager = Post.objects.using(self.using)
+        with explicit_timestamps(manager, posts):
+            manager.bulk_create(posts)
+        Post.tags.through.objects.using(self.using).bulk_create(post_tags)
+
+    def create_comments(self, records):
+        comments = [
+            Comment(
+                pk=r['id'],
+                post_id=r['post'],
+                author_id=self.author_id(r['author']),
+                text=r['text'],
+                created_at=parse_datetime(r['created_at']),
+                modified_at=parse_datetime(r.get('modified_at') or r['created_at']),
+            )
+            for r in records
+        ]
+        manager = Comment.objects.using(self.using)
+        with explicit_timestamps(manager, comments):
+            manager.bulk_create(comments)
+
+    def reset_sequences(self):
+        # id 를 직접 넣었으므로 PostgreSQL 등의 sequence 를 맞춰 둔다 (sqlite 는 할 일 없음).
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), [Post, Comment, Category, Tag])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+def read_records(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError('Line {}: {}'.format(number, e))
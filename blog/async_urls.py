@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# ASGI 로 띄울 때 (settings.BLOG_ASYNC_VIEWS) 읽기 view 만 async 로 바꾸고, 쓰기는 blog/urls.py 그대로
+urlpatterns = [
+    path('search/<str:q>/', async_views.post_search),
+    path('tag/<str:slug>/', async_views.post_list_by_tag),
+    path('category/<str:slug>/', async_views.post_list_by_category),
+    path('<int:pk>/', async_views.post_detail),
+    path('', async_views.post_list),
+] + sync_urlpatterns
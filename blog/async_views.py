@@ -0,0 +1,234 @@
+"""
+ASGI 용 읽기 view (PostList, PostDetail, PostSearch, tag/category).
+
+blog/views.py 의 CBV 를 그대로 설정/캐시/조건부 GET 에 쓰고, 서로 독립적인 조회
+(글 목록 page, sidebar, tag/category, 댓글)는 DB executor 에서 동시에 실행한다.
+Markdown 렌더링은 크기가 정해진 별도 executor 에서 돌려서 event loop 를 막지 않는다.
+blog/async_urls.py 가 연결하고, BLOG_ASYNC_VIEWS=1 일 때만 쓴다 (WSGI 보다 빠른 것을 benchmark_asgi 로 확인한 뒤).
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from django.shortcuts import render
+
+from . import views
+from .forms import CommentForm
+from .metrics import timed
+from .models import Post, Category, Tag, Comment
+from .avatars import get_avatar_urls
+from .pagination import page_urls
+from .related import related_posts
+from .search import search_posts
+from .sidebar import get_sidebar_context, get_sidebar_version
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name, setting, default):
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=getattr(settings, setting, default),
+                thread_name_prefix='blog-async-{}'.format(name),
+            )
+    return _executors[name]
+
+
+def release_connections():
+    """
+    executor thread 의 DB 연결은 thread 가 살아 있는 동안 다시 쓴다. CONN_MAX_AGE=0 이어도
+    ORM 호출마다 연결하고 닫지 않는다 (연결 수는 BLOG_ASYNC_DB_WORKERS 개로 정해져 있다).
+    오류로 쓸 수 없게 된 연결과 CONN_MAX_AGE(> 0)가 지난 연결만 닫는다.
+    """
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        if conn.errors_occurred:
+            if conn.is_usable():
+                conn.errors_occurred = False
+            else:
+                conn.close()
+                continue
+        if conn.settings_dict['CONN_MAX_AGE'] and conn.close_at is not None and time.monotonic() >= conn.close_at:
+            conn.close()
+
+
+def _releasing(func):
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            release_connections()
+    return inner
+
+
+async def run_query(func, *args, **kwargs):
+    """
+    ORM 호출을 BLOG_ASYNC_DB_WORKERS 크기의 executor 에서 실행한다 (thread 마다 계속 쓰는 DB 연결).
+    0 이면 Django 의 공유 sync thread 에서 순서대로 실행한다 (테스트처럼 한 연결/transaction 을 써야 할 때).
+    """
+    if getattr(settings, 'BLOG_ASYNC_DB_WORKERS', 4) <= 0:
+        return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+    executor = get_executor('db', 'BLOG_ASYNC_DB_WORKERS', 4)
+    # router(replica) 상태, 요청 metrics 같은 contextvar 를 그대로 넘긴다.
+    call = functools.partial(contextvars.copy_context().run, _releasing(func), *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+async def run_markdown(func, *args):
+    executor = get_executor('markdown', 'BLOG_MARKDOWN_WORKERS', 2)
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+def _precheck(view):
+    """
+    조건부 GET / page cache 를 확인한다 (cache 와 DB 를 읽으므로 thread 에서).
+    (바로 돌려줄 response 또는 None, page cache key, (etag, last_modified), sidebar version)
+    """
+    request = view.request
+    # request.user (session + DB) 도 여기서 읽어 둔다.
+    request.user.is_authenticated
+    validators = None
+    if view.conditional_get_enabled and request.method in ('GET', 'HEAD'):
+        response, etag, last_modified = view.check_not_modified()
+        if response is not None:
+            return response, None, None, None
+        validators = (etag, last_modified)
+    key = None
+    if view.use_page_cache():
+        key, cached = view.get_cached_page()
+        if cached is not None:
+            return cached, None, None, None
+    return None, key, validators, get_sidebar_version()
+
+
+def _render(view, template_name, context, key, validators):
+    with timed('template'):
+        response = render(view.request, template_name, context)
+    if key is not None:
+        response['X-Blog-Page-Cache'] = 'miss'
+    if validators is not None:
+        view.add_validators(response, *validators)
+    if key is not None and response.status_code == 200:
+        view.store_page(key, response)
+    return response
+
+
+async def serve(request, view_class, kwargs, template_name, build_context):
+    view = view_class()
+    view.setup(request, **kwargs)
+    response, key, validators, version = await run_query(_precheck, view)
+    if response is not None:
+        return response
+
+    context, sidebar = await asyncio.gather(
+        build_context(view),
+        run_query(get_sidebar_context, version),
+    )
+    context.update({'view': view, 'sidebar_version': version, 'sidebar': sidebar})
+    return await run_query(_render, view, template_name, context, key, validators)
+
+
+def _paginate(view, queryset):
+    paginator, page, object_list, is_paginated = view.paginate_queryset(queryset, view.paginate_by)
+    context = {
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': is_paginated,
+        'object_list': object_list,
+        'post_list': object_list,
+    }
+    context.update(page_urls(page))
+    return context
+
+
+def _get_or_404(queryset, **lookup):
+    try:
+        return queryset.get(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404('No {} matches the given query.'.format(queryset.model._meta.object_name))
+
+
+async def post_list(request):
+    async def build_context(view):
+        return await run_query(_paginate, view, Post.objects.for_list())
+    return await serve(request, views.PostList, {}, 'blog/post_list.html', build_context)
+
+
+async def post_search(request, q):
+    async def build_context(view):
+        # 검색 backend 도 DB (FTS5) 를 읽는다.
+        context = await run_query(lambda: _paginate(view, search_posts(q)))
+        context['search_info'] = 'Search: "{}"'.format(q)
+        return context
+    return await serve(request, views.PostSearch, {'q': q}, 'blog/post_list.html', build_context)
+
+
+async def post_list_by_tag(request, slug):
+    async def build_context(view):
+        # tag 와 글 목록을 동시에
+        posts = Post.objects.filter(tags__slug=slug).order_by('-created').for_list()
+        context, tag = await asyncio.gather(
+            run_query(_paginate, view, posts),
+            run_query(_get_or_404, Tag.objects.all(), slug=slug),
+        )
+        context['tag'] = tag
+        return context
+    return await serve(request, views.PostListByTag, {'slug': slug}, 'blog/post_list.html', build_context)
+
+
+async def post_list_by_category(request, slug):
+    async def build_context(view):
+        if slug == '_none':
+            context = await run_query(_paginate, view, Post.objects.filter(category=None).order_by('-created').for_list())
+            context['category'] = '미분류'
+            return context
+        posts = Post.objects.filter(category__slug=slug).order_by('-created').for_list()
+        context, category = await asyncio.gather(
+            run_query(_paginate, view, posts),
+            run_query(_get_or_404, Category.objects.all(), slug=slug),
+        )
+        context['category'] = category
+        return context
+    return await serve(request, views.PostListByCategory, {'slug': slug}, 'blog/post_list.html', build_context)
+
+
+def _load_comments(pk):
+    comments = list(Comment.objects.filter(post_id=pk).select_related('author').order_by('created_at', 'pk'))
+    avatar_urls = get_avatar_urls(comment.author_id for comment in comments)
+    for comment in comments:
+        comment.avatar_url = avatar_urls[comment.author_id]
+    return comments
+
+
+async def post_detail(request, pk):
+    async def build_context(view):
+        # 글, 댓글(+아바타), 관련 글을 동시에 읽고, Markdown 은 markdown executor 에서
+        post, comments, related = await asyncio.gather(
+            run_query(_get_or_404, Post.objects.with_relations(), pk=pk),
+            run_query(_load_comments, pk),
+            run_query(related_posts, pk),
+        )
+        await asyncio.gather(
+            run_markdown(post.render_markdown_content),
+            run_markdown(Comment.render_markdown_bulk, comments),
+        )
+        return {
+            'object': post,
+            'post': post,
+            'comments': comments,
+            'comment_form': CommentForm(),
+            'related_posts': related,
+        }
+    return await serve(request, views.PostDetail, {'pk': pk}, 'blog/post_detail.html', build_context)
@@ -0,0 +1,32 @@
+from allauth.socialaccount.models import SocialAccount
+from django.conf import settings
+from django.core.cache import cache
+
+AVATAR_CACHE_KEY = 'blog:avatar:{}'
+
+
+def get_avatar_urls(user_ids):
+    # user id -> avatar url ('' 이면 소셜 계정/아바타 없음).
+    # 캐시에 없는 user 만 SocialAccount 를 한 번에 조회한다.
+    user_ids = set(user_ids)
+    keys = {AVATAR_CACHE_KEY.format(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(list(keys))
+    avatar_urls = {keys[key]: url for key, url in cached.items()}
+
+    missing = user_ids - set(avatar_urls)
+    if missing:
+        resolved = {user_id: '' for user_id in missing}
+        # 템플릿의 socialaccount_set.all.0 과 같이 user 별 첫 번째 계정을 쓴다.
+        for account in SocialAccount.objects.filter(user_id__in=missing).order_by('-pk'):
+            resolved[account.user_id] = account.get_avatar_url() or ''
+        cache.set_many(
+            {AVATAR_CACHE_KEY.format(user_id): url for user_id, url in resolved.items()},
+            getattr(settings, 'BLOG_AVATAR_CACHE_TIMEOUT', 60 * 60 * 24),
+        )
+        avatar_urls.update(resolved)
+
+    return avatar_urls
+
+
+def invalidate_avatar(user_id):
+    cache.delete(AVATAR_CACHE_KEY.format(user_id))
@@ -0,0 +1,136 @@
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections
+from django.utils import timezone
+
+from .archive import explicit_timestamps
+from .models import Post, Category, Tag, Comment
+
+WORDS = (
+    'django python blog markdown 장고 파이썬 블로그 개발 정치 사회 여행 기록 '
+    'cache index query server 검색 성능 데이터 사진 이야기 오늘 내일'
+).split()
+
+
+@contextmanager
+def temporary_sqlite(alias, keep=False):
+    """
+    alias 를 임시 SQLite 파일로 잠시 바꾸고 migrate 한다. 'default' 를 넘기면 view/test client 도
+    이 DB 를 쓴다. 끝나면 원래 설정으로 되돌리고 (keep 이 아니면) 파일을 지운다.
+    """
+    directory = tempfile.mkdtemp(prefix='blog-bench-')
+    original = dict(connections.databases[alias]) if alias in connections.databases else None
+    if original is not None:
+        connections[alias].close()
+    # ConnectionHandler 가 갖고 있는 dict 를 그대로 고쳐야 이미 만들어진 connection 에도 반영된다.
+    settings_dict = connections.databases.setdefault(alias, dict(connections.databases['default']))
+    settings_dict.update(ENGINE='django.db.backends.sqlite3', NAME=os.path.join(directory, 'bench.sqlite3'))
+    try:
+        call_command('migrate', database=alias, verbosity=0)
+        yield settings_dict['NAME']
+    finally:
+        connections[alias].close()
+        if original is None:
+            del connections.databases[alias]
+        else:
+            settings_dict.clear()
+            settings_dict.update(original)
+        if not keep:
+            shutil.rmtree(directory)
+
+
+def seed(posts=1000, comments_per_post=0, tags=20, categories=10, using='default', batch_size=5000, seed=0):
+    """
+    벤치마크용 데이터를 bulk_create 로 빠르게 채운다. save()/signal 을 거치지 않으므로
+    Markdown 렌더링, 검색 색인, 캐시 무효화는 일어나지 않는다.
+    """
+    rng = random.Random(seed)
+    author, _ = User.objects.db_manager(using).get_or_create(username='bench')
+
+    category_list = Category.objects.using(using).bulk_create([
+        Category(name='bench-category-{}'.format(i), slug='bench-category-{}'.format(i))
+        for i in range(categories)
+    ])
+    tag_list = Tag.objects.using(using).bulk_create([
+        Tag(name='bench-tag-{}'.format(i), slug='bench-tag-{}'.format(i))
+        for i in range(tags)
+    ])
+    # sqlite 이외의 backend 는 bulk_create 후 pk 가 채워지지 않을 수 있다.
+    category_ids = list(Category.objects.using(using).filter(slug__startswith='bench-category-').values_list('pk', flat=True))
+    tag_ids = list(Tag.objects.using(using).filter(slug__startswith='bench-tag-').values_list('pk', flat=True))
+
+    now = timezone.now()
+    PostTag = Post.tags.through
+    created_posts = 0
+    for start in range(0, posts, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, posts)):
+            words = rng.choices(WORDS, k=rng.randint(20, 200))
+            created = now - timedelta(minutes=posts - i)
+            batch.append(Post(
+                title='Bench post {}'.format(i),
+                content=' '.join(words),
+                created=created,
+                modified=created,
+                author=author,
+                category_id=rng.choice(category_ids) if category_ids and rng.random() < 0.8 else None,
+            ))
+        manager = Post.objects.using(using)
+        with explicit_timestamps(manager, batch):
+            manager.bulk_create(batch)
+            post_ids = list(
+                manager.filter(title__startswith='Bench post ')
+                .order_by('-pk').values_list('pk', flat=True)[:len(batch)]
+            )
+            # post_ids 는 최근 것부터
+            for post, post_id in zip(batch, reversed(post_ids)):
+                post.pk = post_id
+        if tag_ids:
+            PostTag.objects.using(using).bulk_create([
+                PostTag(post_id=post_id, tag_id=tag_id)
+                for post_id in post_ids
+                for tag_id in rng.sample(tag_ids, rng.randint(0, min(3, len(tag_ids))))
+            ])
+        if comments_per_post:
+            Comment.objects.using(using).bulk_create([
+                Comment(
+                    post_id=post_id,
+                    text=' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    author=author,
+                    created_at=now,
+                    modified_at=now,
+                )
+                for post_id in post_ids
+                for _ in range(comments_per_post)
+            ])
+        created_posts += len(batch)
+
+    return {
+        'posts': created_posts,
+        'comments': created_posts * comments_per_post,
+        'tags': len(tag_list),
+        'categories': len(category_list),
+    }
+
+
+def prepare_seeded(using='default', stdout=None):
+    # seed() 는 save()/signal 을 거치지 않으므로 import_blog 처럼 파생 데이터를 한 번에 만든다.
+    from .counters import recount_categories, recount_tags, recount_comments
+    from .related import build_related
+    from .search import get_search_backend
+
+    call_command('rebuild_markdown', stdout=stdout)
+    recount_categories()
+    recount_tags()
+    recount_comments()
+    get_search_backend().rebuild()
+    build_related()
+    with connections[using].cursor() as cursor:
+        cursor.execute('ANALYZE')
@@ -0,0 +1,174 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+GENERATION_KEY = 'blog:gen:{}'
+PAGE_KEY = 'blog:page:{}:{}'
+
+# 캐시 그룹 (generation 값을 올리면 그 그룹에 속한 캐시가 모두 무효화된다)
+#   list            /blog/ 와 그 페이지들
+#   post:<pk>       /blog/<pk>/
+#   category:<slug> /blog/category/<slug>/ ('_none' 은 미분류)
+#   tag:<slug>      /blog/tag/<slug>/
+#   sidebar         모든 페이지에 들어가는 Categories 위젯
+
+
+def get_generations(groups):
+    keys = [GENERATION_KEY.format(group) for group in groups]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # 처음이거나 evict 된 경우: 시간 기반 값이라 예전 값과 겹치지 않는다.
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump(*groups):
+    for group in set(groups):
+        key = GENERATION_KEY.format(group)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def page_cache_key(request, groups):
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    version = '.'.join(str(generation) for generation in get_generations(groups))
+    return PAGE_KEY.format(path, version)
+
+
+class PageCacheMixin:
+    """
+    로그인하지 않은 사용자의 GET 응답을 URL(쿼리스트링 포함) 단위로 캐시한다.
+    키에 get_page_cache_groups() 의 generation 이 들어가서, blog/signals.py 가
+    bump() 하면 관련된 페이지만 무효화된다.
+    """
+    page_cache_enabled = True
+    page_cache_groups = ['list']
+
+    def get_page_cache_groups(self):
+        return [group.format(**self.kwargs) for group in self.page_cache_groups] + ['sidebar']
+
+    def use_page_cache(self):
+        request = self.request
+        return (self.page_cache_enabled and request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated)
+
+    def get_cached_page(self):
+        # (key, 캐시된 response 또는 None)
+        key = page_cache_key(self.request, self.get_page_cache_groups())
+        cached = cache.get(key)
+        if cached is None:
+            return key, None
+        content, headers = cached
+        response = HttpResponse(content)
+        for header, value in headers.items():
+            response[header] = value
+        response['X-Blog-Page-Cache'] = 'hit'
+        return key, response
+
+    def store_page(self, key, response, content=None):
+        # csrf_token 이 들어간 페이지는 사용자마다 달라서 캐시하지 않는다.
+        if not self.request.META.get('CSRF_COOKIE_USED'):
+            timeout = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 60 * 10)
+            headers = {
+                header: response[header] for header in ('Content-Type', 'ETag', 'Last-Modified')
+                if response.has_header(header)
+            }
+            cache.set(key, (response.content if content is None else content, headers), timeout)
+
+    def store_streamed_page(self, key, response, streaming_content):
+        # StreamingHttpResponse (blog/feeds.py): 끝까지 보낸 뒤에 저장한다. 중간에 끊기면 저장하지 않는다.
+        chunks = []
+        for chunk in streaming_content:
+            chunks.append(chunk)
+            yield chunk
+        self.store_page(key, response, b''.join(chunks))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.use_page_cache():
+            return super(PageCacheMixin, self).dispatch(request, *args, **kwargs)
+
+        key, cached = self.get_cached_page()
+        if cached is not None:
+            return cached
+
+        response = super(PageCacheMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, TemplateResponse):
+            response.add_post_render_callback(lambda rendered: self.store_page(key, rendered))
+            response['X-Blog-Page-Cache'] = 'miss'
+        elif response.status_code == 200 and response.streaming:
+            response.streaming_content = self.store_streamed_page(key, response, response.streaming_content)
+            response['X-Blog-Page-Cache'] = 'miss'
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified 로 조건부 GET 에 304 를 돌려준다 (template 렌더링 전에).
+    ETag 는 page cache group 의 generation + 사용자로 만들어서 DB 를 읽지 않고,
+    Last-Modified 는 get_last_modified() 가 가벼운 aggregate 쿼리 하나로 구한다 (None 이면 ETag 만).
+    사용자마다 다른 페이지는 로그인한 사용자에게 Last-Modified 를 보내지도 보지도 않는다
+    (로그인 전후로 수정 시각이 같아서 익명 페이지에 304 를 돌려주게 된다).
+    PageCacheMixin 보다 앞에 두어야 한다.
+    """
+    conditional_get_enabled = True
+    # 로그인한 사용자마다 다른 페이지 (편집 버튼 등)
+    etag_per_user = True
+
+    def get_last_modified(self):
+        return None
+
+    def use_last_modified(self):
+        return not (self.etag_per_user and self.request.user.is_authenticated)
+
+    def get_etag(self):
+        user_id = self.request.user.pk if self.etag_per_user and self.request.user.is_authenticated else ''
+        parts = [self.request.get_full_path(), user_id] + get_generations(self.get_page_cache_groups())
+        return quote_etag(hashlib.md5(repr(parts).encode('utf-8')).hexdigest())
+
+    def check_not_modified(self):
+        # (304/412 response 또는 None, etag, last_modified)
+        etag = self.get_etag()
+        last_modified = None
+        # If-None-Match 가 있으면 If-Modified-Since 는 보지 않는다 (RFC 7232)
+        if 'HTTP_IF_NONE_MATCH' not in self.request.META and self.use_last_modified():
+            last_modified = self.get_last_modified()
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            # HTTP 날짜는 초 단위
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is not None:
+            patch_vary_headers(response, ('Cookie',))
+        return response, etag, last_modified
+
+    def add_validators(self, response, etag, last_modified):
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if not response.has_header('Last-Modified') and self.use_last_modified():
+                if last_modified is None:
+                    last_modified = self.get_last_modified()
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified.timestamp())
+            patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.conditional_get_enabled or request.method not in ('GET', 'HEAD'):
+            return super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs)
+
+        response, etag, last_modified = self.check_not_modified()
+        if response is not None:
+            return response
+        response = super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs)
+        return self.add_validators(response, etag, last_modified)
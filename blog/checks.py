@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# process 마다 따로인 cache backend
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_task_queue_cache(app_configs, **kwargs):
+    # run_tasks worker 가 bump() 한 generation 을 웹 process 가 보지 못하면 page cache 와 ETag 가 계속 예전 것으로 남는다.
+    if getattr(settings, 'BLOG_TASKS_EAGER', False):
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        'The blog job queue (BLOG_TASKS_EAGER off) needs a cache shared by the web and run_tasks processes.',
+        hint='Configure a shared CACHES backend (e.g. DJANGO_CACHE_DIR, memcached, redis) or set BLOG_TASKS_EAGER=1.',
+        obj=backend,
+        id='blog.E001',
+    )]
@@ -0,0 +1,44 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Post, Category, Tag, Comment
+
+# 비정규화된 개수 column
+#   Category.post_count  글 수
+#   Tag.post_count       글 수 (Post.tags)
+#   Post.comment_count   댓글 수
+# blog/signals.py 가 저장/삭제와 같은 transaction 안에서 F() 로 갱신하고,
+# reconcile_counters 명령이 어긋난 row 를 한 번의 UPDATE 로 고친다.
+
+
+def increment(queryset, field, delta=1):
+    if delta < 0:
+        # 이미 어긋난 값 때문에 음수(PositiveIntegerField)가 되지 않도록
+        queryset = queryset.filter(**{field + '__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _count(queryset, field):
+    # 상관 subquery: SELECT COUNT(*) FROM ... WHERE <field> = outer.pk
+    rows = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def _recount(queryset, field, actual):
+    # 값이 다른 row 만 고치고, 고친 row 수를 돌려준다.
+    return queryset.exclude(**{field: actual}).update(**{field: actual})
+
+
+def recount_categories(categories=None):
+    categories = Category.objects.all() if categories is None else categories
+    return _recount(categories, 'post_count', _count(Post.objects.all(), 'category'))
+
+
+def recount_tags(tags=None):
+    tags = Tag.objects.all() if tags is None else tags
+    return _recount(tags, 'post_count', _count(Post.tags.through.objects.all(), 'tag'))
+
+
+def recount_comments(posts=None):
+    posts = Post.objects.all() if posts is None else posts
+    return _recount(posts, 'comment_count', _count(Comment.objects.all(), 'post'))
@@ -0,0 +1,237 @@
+"""
+RSS 2.0 / Atom / JSON Feed
+
+    /blog/feed/<fmt>/                   모든 글
+    /blog/category/<slug>/feed/<fmt>/   category ('_none' 은 미분류)
+    /blog/tag/<slug>/feed/<fmt>/        tag
+    fmt: rss, atom, json
+
+최근 BLOG_FEED_ITEMS 개의 글을 iterator 로 읽어서 저장된 content_html 과 함께 한 항목씩 stream 한다.
+목록 페이지와 같은 cache group ('list', 'category:<slug>', 'tag:<slug>') 으로 캐시되고
+ETag 로 조건부 GET 에 304 를 돌려준다 (blog/cache.py).
+"""
+import json
+from collections import defaultdict
+from io import StringIO
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views import View
+
+from .cache import ConditionalGetMixin, PageCacheMixin
+from .models import Post, Category, Tag
+
+SITE_TITLE = 'eod940'
+
+
+def _xml(write):
+    stream = StringIO()
+    write(SimplerXMLGenerator(stream, 'utf-8', short_empty_elements=True))
+    return stream.getvalue()
+
+
+class RssWriter:
+    content_type = 'application/rss+xml; charset=utf-8'
+
+    def start(self, feed):
+        def write(handler):
+            handler.startDocument()
+            handler.startElement('rss', {
+                'version': '2.0',
+                'xmlns:atom': 'http://www.w3.org/2005/Atom',
+                'xmlns:dc': 'http://purl.org/dc/elements/1.1/',
+            })
+            handler.startElement('channel', {})
+            handler.addQuickElement('title', feed['title'])
+            handler.addQuickElement('link', feed['link'])
+            handler.addQuickElement('description', feed['description'])
+            handler.addQuickElement('atom:link', None, {'rel': 'self', 'href': feed['feed_url']})
+            handler.addQuickElement('language', settings.LANGUAGE_CODE)
+            if feed['updated']:
+                handler.addQuickElement('lastBuildDate', rfc2822_date(feed['updated']))
+        return _xml(write)
+
+    def item(self, entry):
+        def write(handler):
+            handler.startElement('item', {})
+            handler.addQuickElement('title', entry['title'])
+            handler.addQuickElement('link', entry['link'])
+            handler.addQuickElement('guid', entry['link'], {'isPermaLink': 'true'})
+            handler.addQuickElement('pubDate', rfc2822_date(entry['published']))
+            handler.addQuickElement('dc:creator', entry['author'])
+            for category in entry['categories'] + entry['tags']:
+                handler.addQuickElement('category', category)
+            handler.addQuickElement('description', entry['content_html'])
+            handler.endElement('item')
+        return _xml(write)
+
+    def end(self):
+        return '</channel></rss>'
+
+
+class AtomWriter:
+    content_type = 'application/atom+xml; charset=utf-8'
+
+    def start(self, feed):
+        def write(handler):
+            handler.startDocument()
+            handler.startElement('feed', {'xmlns': 'http://www.w3.org/2005/Atom', 'xml:lang': settings.LANGUAGE_CODE})
+            handler.addQuickElement('title', feed['title'])
+            handler.addQuickElement('subtitle', feed['description'])
+            handler.addQuickElement('link', None, {'rel': 'alternate', 'href': feed['link']})
+            handler.addQuickElement('link', None, {'rel': 'self', 'href': feed['feed_url']})
+            handler.addQuickElement('id', feed['feed_url'])
+            if feed['updated']:
+                handler.addQuickElement('updated', rfc3339_date(feed['updated']))
+        return _xml(write)
+
+    def item(self, entry):
+        def write(handler):
+            handler.startElement('entry', {})
+            handler.addQuickElement('title', entry['title'])
+            handler.addQuickElement('link', None, {'rel': 'alternate', 'href': entry['link']})
+            handler.addQuickElement('id', entry['link'])
+            handler.addQuickElement('published', rfc3339_date(entry['published']))
+            handler.addQuickElement('updated', rfc3339_date(entry['updated']))
+            handler.startElement('author', {})
+            handler.addQuickElement('name', entry['author'])
+            handler.endElement('author')
+            for category in entry['categories'] + entry['tags']:
+                handler.addQuickElement('category', None, {'term': category})
+            handler.addQuickElement('summary', entry['summary'], {'type': 'text'})
+            handler.addQuickElement('content', entry['content_html'], {'type': 'html'})
+            handler.endElement('entry')
+        return _xml(write)
+
+    def end(self):
+        return '</feed>'
+
+
+class JsonFeedWriter:
+    # https://jsonfeed.org/version/1.1
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def start(self, feed):
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': feed['title'],
+            'home_page_url': feed['link'],
+            'feed_url': feed['feed_url'],
+            'description': feed['description'],
+            'language': settings.LANGUAGE_CODE,
+        }, ensure_ascii=False)
+        self.separator = ''
+        return header[:-1] + ', "items": ['
+
+    def item(self, entry):
+        item = json.dumps({
+            'id': entry['link'],
+            'url': entry['link'],
+            'title': entry['title'],
+            'content_html': entry['content_html'],
+            'summary': entry['summary'],
+            'date_published': entry['published'].isoformat(),
+            'date_modified': entry['updated'].isoformat(),
+            'authors': [{'name': entry['author']}],
+            'tags': entry['tags'],
+        }, ensure_ascii=False)
+        separator, self.separator = self.separator, ', '
+        return separator + item
+
+    def end(self):
+        return ']}'
+
+
+WRITERS = {
+    'rss': RssWriter,
+    'atom': AtomWriter,
+    'json': JsonFeedWriter,
+}
+
+
+class PostFeed(ConditionalGetMixin, PageCacheMixin, View):
+    # kind: None (모든 글) / 'category' / 'tag'
+    kind = None
+    # 사용자와 상관없이 같은 내용
+    etag_per_user = False
+
+    def get_page_cache_groups(self):
+        # sidebar 가 없는 응답이라 'sidebar' 는 넣지 않는다.
+        if self.kind is None:
+            return ['list']
+        return ['{}:{}'.format(self.kind, self.kwargs['slug'])]
+
+    def use_page_cache(self):
+        return self.page_cache_enabled and self.request.method in ('GET', 'HEAD')
+
+    def get_queryset(self):
+        posts = Post.objects.all()
+        if self.kind == 'category':
+            slug = self.kwargs['slug']
+            posts = posts.filter(category=None) if slug == '_none' else posts.filter(category__slug=slug)
+        elif self.kind == 'tag':
+            posts = posts.filter(tags__slug=self.kwargs['slug'])
+        return posts
+
+    def get_updated(self):
+        # feed 의 updated. (modified) / (category, modified) index
+        # Last-Modified 로는 쓰지 않는다 (글이 지워지거나 옮겨져도 바뀌지 않는다). 조건부 GET 은 ETag 로
+        return self.get_queryset().aggregate(last=Max('modified'))['last']
+
+    def get_feed_info(self):
+        title, link = SITE_TITLE, '/blog/'
+        if self.kind == 'category':
+            slug = self.kwargs['slug']
+            name = '미분류' if slug == '_none' else get_object_or_404(Category, slug=slug).name
+            title, link = '{} - {}'.format(SITE_TITLE, name), '/blog/category/{}/'.format(slug)
+        elif self.kind == 'tag':
+            tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
+            title, link = '{} - #{}'.format(SITE_TITLE, tag.name), tag.get_absolute_url()
+        return {
+            'title': title,
+            'link': self.request.build_absolute_uri(link),
+            'feed_url': self.request.build_absolute_uri(),
+            'description': 'Latest posts on {}'.format(title),
+        }
+
+    def get(self, request, *args, **kwargs):
+        writer_class = WRITERS.get(kwargs['fmt'])
+        if writer_class is None:
+            raise Http404('Unknown feed format: {}'.format(kwargs['fmt']))
+        feed = self.get_feed_info()
+        feed['updated'] = self.get_updated()
+        return StreamingHttpResponse(self.stream(writer_class(), feed), content_type=writer_class.content_type)
+
+    def entries(self):
+        # 저장된 content_html 을 그대로 쓴다 (stale 한 글만 다시 렌더링). 본문은 chunk 단위로 읽는다.
+        posts = self.get_queryset().select_related('author', 'category').order_by(
+            '-created', '-pk',
+        )[:getattr(settings, 'BLOG_FEED_ITEMS', 20)]
+        # iterator() 는 prefetch 하지 않으므로 tag 이름은 쿼리 하나로 따로 읽는다.
+        tags = defaultdict(list)
+        rows = Post.tags.through.objects.filter(post_id__in=list(posts.values_list('pk', flat=True)))
+        for post_id, name in rows.order_by('tag__name').values_list('post_id', 'tag__name'):
+            tags[post_id].append(name)
+        for post in posts.iterator(chunk_size=50):
+            link = self.request.build_absolute_uri(post.get_absolute_url())
+            yield {
+                'title': post.title,
+                'link': link,
+                'published': post.created,
+                'updated': post.modified,
+                'author': post.author.username,
+                'categories': [post.category.name] if post.category else [],
+                'tags': tags[post.pk],
+                'summary': post.excerpt,
+                'content_html': post.get_markdown_content(),
+            }
+
+    def stream(self, writer, feed):
+        yield writer.start(feed)
+        for entry in self.entries():
+            yield writer.item(entry)
+        yield writer.end()
@@ -0,0 +1,120 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+# 이름: (가로 px, 용도)
+VARIANTS = {
+    'thumb': 150,
+    'card': 700,
+    'detail': 1200,
+}
+FORMATS = {
+    'jpeg': ('.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('.webp', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BLOG_IMAGE_WORKERS', 2),
+                thread_name_prefix='blog-images',
+            )
+    return _executor
+
+
+def variant_name(name, variant, fmt):
+    # blog/2020/12/30/eod.jpg -> blog/2020/12/30/variants/eod.jpg.card.webp
+    # 원본 확장자까지 넣어야 같은 폴더의 eod.jpg 와 eod.png 가 서로의 variant 를 덮어쓰지 않는다.
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'variants', '{}.{}{}'.format(filename, variant, FORMATS[fmt][0]))
+
+
+def render_variants(name):
+    # 원본을 한 번 읽어서 VARIANTS x FORMATS 를 저장하고 {variant: {'width', 'jpeg', 'webp'}} 를 돌려준다.
+    with default_storage.open(name, 'rb') as f:
+        original = Image.open(f)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    variants = {}
+    for variant, width in VARIANTS.items():
+        # 원본보다 크게 늘리지는 않는다 (재압축만)
+        width = min(width, original.width)
+        height = max(round(original.height * width / original.width), 1)
+        resized = original.resize((width, height), Image.LANCZOS) if width != original.width else original
+
+        variants[variant] = {'width': width}
+        for fmt, (ext, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt.upper(), **options)
+            target = variant_name(name, variant, fmt)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            variants[variant][fmt] = default_storage.save(target, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def build_head_image_variants(post_id):
+    from .models import Post
+
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.head_image:
+        return None
+    name = post.head_image.name
+    variants = render_variants(name)
+
+    # 그 사이 head_image 가 바뀌었으면 새 작업이 다시 만든다.
+    post.refresh_from_db(fields=['head_image'])
+    if post.head_image.name != name:
+        return None
+    post.head_image_variants = variants
+    # save() 를 거쳐야 modified 와 page/fragment cache 가 갱신된다.
+    post.save(update_fields=['head_image_variants', 'modified'])
+    return variants
+
+
+def build_in_worker(post_id):
+    try:
+        return build_head_image_variants(post_id)
+    finally:
+        # worker thread 마다 열린 DB 연결을 정리한다.
+        connection.close()
+
+
+def schedule_head_image_variants(post_id):
+    # job queue 를 쓰지 않을 때(BLOG_TASKS_EAGER): 요청 안에서 리사이즈하지 않고, commit 후 worker pool 에 넘긴다.
+    transaction.on_commit(lambda: get_executor().submit(build_in_worker, post_id))
+
+
+def head_image_context(post, variant='card'):
+    # template 용: 가장 알맞은 src 와 jpeg/webp srcset
+    variants = post.head_image_variants or {}
+    if not variants:
+        return {'src': post.head_image.url, 'srcset': '', 'webp_srcset': ''}
+
+    ordered = sorted(variants.values(), key=lambda v: v['width'])
+
+    def srcset(fmt):
+        return ', '.join('{} {}w'.format(default_storage.url(v[fmt]), v['width']) for v in ordered)
+
+    chosen = variants.get(variant) or ordered[-1]
+    return {
+        'src': default_storage.url(chosen['jpeg']),
+        'srcset': srcset('jpeg'),
+        'webp_srcset': srcset('webp'),
+    }
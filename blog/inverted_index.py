@@ -0,0 +1,407 @@
+import bisect
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: 파일 잠금 없이 동작
+    fcntl = None
+
+# 한글/한자/가나 연속 구간은 띄어쓰기만으로 단어를 나눌 수 없어서 2-gram 으로 색인한다.
+# 한 글자 검색어를 위해 색인에는 1-gram 도 넣는다 (검색어는 2글자 이상이면 2-gram 만).
+_CJK = '\u1100-\u11ff\u3130-\u318f\uac00-\ud7af\u3040-\u30ff\u4e00-\u9fff'
+TOKEN_RE = re.compile('[{0}]+|[^\\W{0}]+'.format(_CJK))
+CJK_RE = re.compile('[{}]'.format(_CJK))
+
+TITLE_WEIGHT = 2
+
+
+def tokenize(text, unigrams=False):
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if CJK_RE.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if unigrams:
+                tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def document_terms(title, content, unigrams=False):
+    counts = Counter(tokenize(content, unigrams))
+    for token in tokenize(title, unigrams):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+class _Segment:
+    """
+    디스크에 저장된 읽기 전용 색인. mmap 으로 열기 때문에 같은 파일을 연 worker
+    process 들은 page cache 를 공유하고, 시작할 때 색인을 다시 만들지 않는다.
+
+    layout (모든 정수 배열은 array('I'), native byte order)
+        header | doc_ids | doc_lengths | term_offsets | posting_offsets
+               | posting_doc_ids | posting_tfs | terms (utf-8, '\\n' 구분)
+    """
+    # 2: CJK 1-gram 추가
+    MAGIC = b'BLOGIDX2'
+    HEADER = struct.Struct('<8sBxxxIIIQ')
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, n_docs, n_terms, n_postings, total_length = self.HEADER.unpack_from(self.mmap)
+        if magic != self.MAGIC or byteorder != (sys.byteorder == 'little'):
+            self.mmap.close()
+            raise ValueError('{} is not a compatible search index'.format(path))
+
+        self.n_docs = n_docs
+        self.n_terms = n_terms
+        self.total_length = total_length
+
+        view = memoryview(self.mmap)
+        offset = self.HEADER.size
+
+        def take(count):
+            nonlocal offset
+            part = view[offset:offset + count * 4].cast('I')
+            offset += count * 4
+            return part
+
+        self.doc_ids = take(n_docs)
+        self.doc_lengths = take(n_docs)
+        self.term_offsets = take(n_terms + 1)
+        self.posting_offsets = take(n_terms + 1)
+        self.posting_doc_ids = take(n_postings)
+        self.posting_tfs = take(n_postings)
+        self.terms = view[offset:]
+
+    def term(self, i):
+        return bytes(self.terms[self.term_offsets[i]:self.term_offsets[i + 1] - 1]).decode('utf-8')
+
+    def find_term(self, term):
+        key = term.encode('utf-8')
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = bytes(self.terms[self.term_offsets[mid]:self.term_offsets[mid + 1] - 1])
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def postings(self, i):
+        start, end = self.posting_offsets[i], self.posting_offsets[i + 1]
+        return self.posting_doc_ids[start:end], self.posting_tfs[start:end]
+
+    def doc_length(self, doc_id):
+        i = bisect.bisect_left(self.doc_ids, doc_id)
+        if i < self.n_docs and self.doc_ids[i] == doc_id:
+            return self.doc_lengths[i]
+        return None
+
+    @classmethod
+    def write(cls, path, doc_lengths, postings):
+        # doc_lengths: {doc_id: length}, postings: {term: [(doc_id, tf), ...]}
+        doc_ids = sorted(doc_lengths)
+        terms = sorted(postings)
+
+        term_blob = bytearray()
+        term_offsets = array('I', [0])
+        posting_offsets = array('I', [0])
+        posting_doc_ids = array('I')
+        posting_tfs = array('I')
+        for term in terms:
+            term_blob += term.encode('utf-8') + b'\n'
+            term_offsets.append(len(term_blob))
+            for doc_id, tf in sorted(postings[term]):
+                posting_doc_ids.append(doc_id)
+                posting_tfs.append(tf)
+            posting_offsets.append(len(posting_doc_ids))
+
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-index-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(cls.HEADER.pack(
+                    cls.MAGIC, sys.byteorder == 'little', len(doc_ids), len(terms),
+                    len(posting_doc_ids), sum(doc_lengths.values()),
+                ))
+                array('I', doc_ids).tofile(f)
+                array('I', [doc_lengths[doc_id] for doc_id in doc_ids]).tofile(f)
+                term_offsets.tofile(f)
+                posting_offsets.tofile(f)
+                posting_doc_ids.tofile(f)
+                posting_tfs.tofile(f)
+                f.write(term_blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class InvertedIndex:
+    """
+    Post.title / Post.content 의 역색인 (term -> posting list of post ids) 과 BM25 검색.
+
+    디스크의 _Segment 위에 변경(delta)을 얹어서 쓴다. 수정/삭제된 글은 segment 에서 tombstone 으로 가린다.
+    flush() 는 변경을 '<path>.delta' 에 한 줄씩 덧붙이기만 하고 (글 하나 크기),
+    delta 가 merge_bytes 를 넘으면 그때 segment 에 합쳐서 새로 쓴다.
+    다른 process 는 refresh() 할 때 delta 의 새 줄만 읽는다.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, path, merge_bytes=1 << 20):
+        self.path = str(path)
+        self.delta_path = self.path + '.delta'
+        self.merge_bytes = merge_bytes
+        self.segment = None
+        self.segment_stat = None
+        self.pending = []
+        # get_search_backend() 의 backend 는 process 마다 하나라서 thread 들이 같이 쓴다.
+        # 항상 파일 잠금(lock())보다 먼저 잡는다. flush()/build() 안에서 refresh() 를 부르므로 RLock
+        self.mutex = threading.RLock()
+        self._reset_delta()
+
+    def _reset_delta(self):
+        self.delta_postings = {}
+        self.delta_lengths = {}
+        self.delta_terms = {}
+        self.removed = set()
+        # delta 파일에서 읽은 위치
+        self.delta_inode = None
+        self.delta_offset = 0
+        # segment 와 delta 를 합친 글 수, 길이 합 (BM25)
+        self.n_docs = self.segment.n_docs if self.segment is not None else 0
+        self.total_length = self.segment.total_length if self.segment is not None else 0
+
+    @contextmanager
+    def lock(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def refresh(self):
+        with self.mutex:
+            self._refresh()
+
+    def _refresh(self):
+        # 다른 process 가 파일을 새로 썼으면 다시 mmap 한다.
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        reloaded = key != self.segment_stat
+        if reloaded:
+            # 이전 segment 는 참조가 사라지면 unmap 된다 (검색 중인 memoryview 가 남아 있을 수 있음).
+            self.segment = _Segment(self.path)
+            self.segment_stat = key
+            self._reset_delta()
+        if self._read_delta() or reloaded:
+            # 아직 flush 하지 않은 이 process 의 변경이 가장 최근 것
+            for op in self.pending:
+                self._apply(*op)
+
+    def _read_delta(self):
+        # delta 파일에 새로 덧붙은 줄을 적용하고, 적용한 것이 있으면 True
+        try:
+            f = open(self.delta_path, 'rb')
+        except FileNotFoundError:
+            return False
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self.delta_inode or stat.st_size < self.delta_offset:
+                # segment 에 합쳐진 뒤 새로 시작한 delta. op 는 다시 적용해도 결과가 같다.
+                self.delta_inode = stat.st_ino
+                self.delta_offset = 0
+            f.seek(self.delta_offset)
+            data = f.read()
+        # 쓰는 중인 마지막 줄은 다음에
+        data = data[:data.rfind(b'\n') + 1]
+        for line in data.splitlines():
+            doc_id, counts = json.loads(line)
+            self._apply('remove' if counts is None else 'add', doc_id, counts)
+        self.delta_offset += len(data)
+        return bool(data)
+
+    def add(self, doc_id, title, content):
+        op = ('add', doc_id, document_terms(title, content, unigrams=True))
+        with self.mutex:
+            self.pending.append(op)
+            self._apply(*op)
+
+    def remove(self, doc_id):
+        op = ('remove', doc_id, None)
+        with self.mutex:
+            self.pending.append(op)
+            self._apply(*op)
+
+    def _apply(self, action, doc_id, counts):
+        # 이미 있는 글을 다시 add 하면 글 수는 그대로 (길이만 바뀜)
+        old_length = self._current_length(doc_id)
+        if old_length is not None:
+            self.n_docs -= 1
+            self.total_length -= old_length
+
+        self.removed.add(doc_id)
+        for term in self.delta_terms.pop(doc_id, ()):
+            self.delta_postings[term].pop(doc_id, None)
+        self.delta_lengths.pop(doc_id, None)
+
+        if action == 'add':
+            for term, tf in counts.items():
+                self.delta_postings.setdefault(term, {})[doc_id] = tf
+            self.delta_terms[doc_id] = list(counts)
+            self.delta_lengths[doc_id] = sum(counts.values())
+            self.n_docs += 1
+            self.total_length += self.delta_lengths[doc_id]
+
+    def _current_length(self, doc_id):
+        # 지금 색인에 있는 글이면 길이, 없으면 None
+        if doc_id in self.delta_lengths:
+            return self.delta_lengths[doc_id]
+        if doc_id in self.removed or self.segment is None:
+            return None
+        return self.segment.doc_length(doc_id)
+
+    def flush(self):
+        with self.mutex:
+            if self.pending:
+                self._flush()
+
+    def _flush(self):
+        with self.lock():
+            self._refresh()
+            lines = b''.join(
+                json.dumps([doc_id, counts], ensure_ascii=False).encode('utf-8') + b'\n'
+                for action, doc_id, counts in self.pending
+            )
+            if self.delta_offset + len(lines) > self.merge_bytes:
+                self._write_segment(*self._merged())
+                return
+            with open(self.delta_path, 'ab') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending = []
+            self._refresh()
+
+    def _write_segment(self, doc_lengths, postings):
+        # lock 안에서. segment 를 새로 쓰고 delta 를 비운다.
+        _Segment.write(self.path, doc_lengths, postings)
+        try:
+            os.remove(self.delta_path)
+        except FileNotFoundError:
+            pass
+        self.pending = []
+        self.segment_stat = None
+        self._refresh()
+
+    def build(self, documents, only_if_missing=False):
+        # documents: iterable of (doc_id, title, content)
+        # only_if_missing: 여러 worker 가 동시에 시작해도 한 process 만 색인을 만든다.
+        with self.mutex, self.lock():
+            if only_if_missing and self.exists():
+                self._refresh()
+                return
+            doc_lengths = {}
+            postings = {}
+            for doc_id, title, content in documents:
+                counts = document_terms(title, content, unigrams=True)
+                doc_lengths[doc_id] = sum(counts.values())
+                for term, tf in counts.items():
+                    postings.setdefault(term, []).append((doc_id, tf))
+            self._write_segment(doc_lengths, postings)
+
+    def _merged(self):
+        doc_lengths = {}
+        postings = {}
+        segment = self.segment
+        if segment is not None:
+            for i in range(segment.n_docs):
+                doc_id = segment.doc_ids[i]
+                if doc_id not in self.removed:
+                    doc_lengths[doc_id] = segment.doc_lengths[i]
+            for i in range(segment.n_terms):
+                doc_ids, tfs = segment.postings(i)
+                entries = [(d, tf) for d, tf in zip(doc_ids, tfs) if d not in self.removed]
+                if entries:
+                    postings[segment.term(i)] = entries
+        doc_lengths.update(self.delta_lengths)
+        for term, entries in self.delta_postings.items():
+            if entries:
+                postings.setdefault(term, []).extend(entries.items())
+        return doc_lengths, postings
+
+    def _term_postings(self, term):
+        entries = []
+        segment = self.segment
+        if segment is not None:
+            i = segment.find_term(term)
+            if i is not None:
+                doc_ids, tfs = segment.postings(i)
+                entries.extend((d, tf) for d, tf in zip(doc_ids, tfs) if d not in self.removed)
+        entries.extend(self.delta_postings.get(term, {}).items())
+        return entries
+
+    def _doc_length(self, doc_id):
+        length = self.delta_lengths.get(doc_id)
+        if length is None and self.segment is not None:
+            length = self.segment.doc_length(doc_id)
+        return length or 0
+
+    def search(self, query, limit):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self.mutex:
+            return self._search(terms, limit)
+
+    def _search(self, terms, limit):
+        n_docs = max(self.n_docs, 1)
+        avg_length = max(self.total_length / n_docs, 1)
+
+        scores = {}
+        matched = Counter()
+        for term in terms:
+            entries = self._term_postings(term)
+            if not entries:
+                return []
+            idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc_id, tf in entries:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_length(doc_id) / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_id] += 1
+
+        # 검색어의 모든 term 이 들어 있는 글만 (AND)
+        candidates = ((score, doc_id) for doc_id, score in scores.items() if matched[doc_id] == len(terms))
+        return [(doc_id, score) for score, doc_id in heapq.nlargest(limit, candidates)]
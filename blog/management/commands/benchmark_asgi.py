@@ -0,0 +1,132 @@
+import asyncio
+import random
+import threading
+import time
+import types
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import include, path
+
+from blog.bench import prepare_seeded, seed, temporary_sqlite
+from blog.management.commands.benchmark_views import percentile
+from blog.models import Post, Category, Tag
+
+# 캐시 없이 view 가 하는 DB/Markdown/template 일을 비교한다.
+BENCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def async_urlconf():
+    # my_site_prj/urls.py 는 import 할 때 BLOG_ASYNC_VIEWS 를 보므로, ASGI 쪽은 blog/ 만 바꾼 urlconf 를 따로 만든다.
+    # (template 이 allauth 등 다른 app 의 url 을 reverse 하므로 나머지는 그대로 둔다)
+    from my_site_prj.urls import urlpatterns
+    module = types.ModuleType('blog_benchmark_async_urls')
+    module.urlpatterns = [path('blog/', include('blog.async_urls'))] + [
+        pattern for pattern in urlpatterns if str(pattern.pattern) != 'blog/'
+    ]
+    return module
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of the sync views under WSGI (one thread per request) with the async '
+        'views under ASGI (one event loop) at the same concurrency, on a throwaway SQLite database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments-per-post', type=int, default=5)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode.')
+        parser.add_argument('--db-workers', type=int, default=8, help='BLOG_ASYNC_DB_WORKERS for the ASGI run.')
+
+    def handle(self, *args, **options):
+        with temporary_sqlite('default'), \
+                override_settings(CACHES=BENCH_CACHES, DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                                  BLOG_METRICS_SAMPLE_RATE=0):
+            counts = seed(posts=options['posts'], comments_per_post=options['comments_per_post'])
+            prepare_seeded()
+            urls = self.urls()
+            connection.close()
+            self.stdout.write('Seeded {}; {} concurrent clients, {:.0f}s per mode'.format(
+                counts, options['concurrency'], options['duration']))
+
+            wsgi = self.run_wsgi(urls, options)
+            with override_settings(ROOT_URLCONF=async_urlconf(), BLOG_ASYNC_DB_WORKERS=options['db_workers']):
+                asgi = asyncio.run(self.run_asgi(urls, options))
+
+        for name, (timings, errors, elapsed) in (('WSGI', wsgi), ('ASGI', asgi)):
+            if not timings:
+                self.stdout.write('{}: no successful requests, {} errors'.format(name, errors))
+                continue
+            self.stdout.write('{}: {:>8.1f} req/s  p50 {:>7.1f} ms  p99 {:>7.1f} ms  errors {}'.format(
+                name, len(timings) / elapsed, percentile(timings, 50), percentile(timings, 99), errors))
+
+    def urls(self):
+        posts = list(Post.objects.order_by('?').values_list('pk', flat=True)[:50])
+        categories = list(Category.objects.values_list('slug', flat=True))
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        # 목록 / 상세 / tag / category / 검색을 섞는다.
+        return (
+            ['/blog/'] * 4
+            + ['/blog/{}/'.format(pk) for pk in posts[:8]]
+            + ['/blog/category/{}/'.format(slug) for slug in categories[:2]]
+            + ['/blog/tag/{}/'.format(slug) for slug in tags[:2]]
+            + ['/blog/search/python/']
+        )
+
+    def run_wsgi(self, urls, options):
+        timings = []
+        errors = [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def worker(number):
+            rng = random.Random(number)
+            client = Client(raise_request_exception=False)
+            local = []
+            failed = 0
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    response = client.get(rng.choice(urls))
+                    if response.status_code == 200:
+                        local.append((time.perf_counter() - started) * 1000)
+                    else:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                timings.extend(local)
+                errors[0] += failed
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings, errors[0], time.perf_counter() - started
+
+    async def run_asgi(self, urls, options):
+        timings = []
+        errors = 0
+        deadline = time.perf_counter() + options['duration']
+
+        async def worker(number):
+            nonlocal errors
+            rng = random.Random(number)
+            client = AsyncClient(raise_request_exception=False)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(rng.choice(urls))
+                if response.status_code == 200:
+                    timings.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(i) for i in range(options['concurrency'])])
+        return timings, errors, time.perf_counter() - started
@@ -0,0 +1,82 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from blog.bench import seed, temporary_sqlite
+from blog.models import Post, Category, Tag, Comment
+
+BENCH_ALIAS = 'bench'
+# blog/migrations/0003_list_indexes.py
+LIST_INDEXES = ['blog_post_created_id_idx', 'blog_post_cat_created_idx', 'blog_comment_post_created_idx']
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway SQLite database and compare the list-view query plans '
+        'with and without the indexes from 0003_list_indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments-per-post', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded database file.')
+
+    def handle(self, *args, **options):
+        with temporary_sqlite(BENCH_ALIAS, keep=options['keep']) as path:
+            started = time.perf_counter()
+            counts = seed(
+                posts=options['posts'],
+                comments_per_post=options['comments_per_post'],
+                using=BENCH_ALIAS,
+            )
+            self.stdout.write('Seeded {} in {:.1f}s'.format(counts, time.perf_counter() - started))
+            with connections[BENCH_ALIAS].cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            with_indexes = self.run_queries(options['repeat'])
+            with connections[BENCH_ALIAS].cursor() as cursor:
+                for name in LIST_INDEXES:
+                    cursor.execute('DROP INDEX {}'.format(name))
+                cursor.execute('ANALYZE')
+            without_indexes = self.run_queries(options['repeat'])
+
+            for name, (plan, ms) in with_indexes.items():
+                old_plan, old_ms = without_indexes[name]
+                self.stdout.write('\n== {} =='.format(name))
+                self.stdout.write('without indexes ({:.3f} ms)\n{}'.format(old_ms, old_plan))
+                self.stdout.write('with indexes    ({:.3f} ms)\n{}'.format(ms, plan))
+        if options['keep']:
+            self.stdout.write('\nDatabase kept at {}'.format(path))
+
+    def queries(self):
+        posts = Post.objects.using(BENCH_ALIAS)
+        middle = posts.order_by('-created', '-pk')[posts.count() // 2]
+        category = Category.objects.using(BENCH_ALIAS).first()
+        tag = Tag.objects.using(BENCH_ALIAS).first()
+
+        # blog/views.py + blog/pagination.py 가 만드는 쿼리와 같은 모양
+        return {
+            'PostList (first page)': posts.order_by('-created', '-pk')[:6],
+            'PostList (deep keyset page)': posts.filter(created__lte=middle.created).filter(
+                Q(created__lt=middle.created) | Q(created=middle.created, pk__lt=middle.pk)
+            ).order_by('-created', '-pk')[:6],
+            'PostListByCategory': posts.filter(category=category).order_by('-created', '-pk')[:6],
+            'PostListByTag': posts.filter(tags=tag).order_by('-created', '-pk')[:6],
+            'PostDetail comments': Comment.objects.using(BENCH_ALIAS).filter(post=middle).order_by('created_at', 'pk'),
+        }
+
+    def run_queries(self, repeat):
+        results = {}
+        for name, queryset in self.queries().items():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset._chain())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (plan, statistics.median(timings))
+        return results
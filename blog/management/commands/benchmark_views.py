@@ -0,0 +1,194 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from blog.bench import prepare_seeded, seed, temporary_sqlite
+from blog.models import Post, Category, Tag
+from blog.pagination import encode_cursor
+
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-benchmark',
+    },
+}
+
+
+def percentile(values, p):
+    # nearest-rank
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway SQLite database and measure the blog views through the test client: '
+        'latency percentiles, queries and allocations per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments-per-post', type=int, default=5)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--alloc-requests', type=int, default=5,
+                            help='Extra requests per endpoint measured under tracemalloc.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='A previous --output file to compare p50 latency against.')
+
+    def handle(self, *args, **options):
+        with temporary_sqlite('default'), \
+                override_settings(CACHES=BENCH_CACHES, DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            started = time.perf_counter()
+            counts = seed(
+                posts=options['posts'],
+                comments_per_post=options['comments_per_post'],
+                tags=options['tags'],
+                categories=options['categories'],
+            )
+            prepare_seeded(stdout=self.stdout)
+            self.stdout.write('Seeded {} in {:.1f}s'.format(counts, time.perf_counter() - started))
+
+            results = {}
+            for name, (method, url, client) in self.endpoints().items():
+                if method == 'GET':
+                    # cold: page/fragment cache 없이 view 전체, warm: 두 번째 요청부터 cache hit
+                    results[name + ' (cold)'] = self.measure(client, method, url, options, clear_cache=True)
+                    results[name + ' (warm)'] = self.measure(client, method, url, options, clear_cache=False)
+                else:
+                    results[name] = self.measure(client, method, url, options, clear_cache=False)
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'seed': counts,
+                'requests': options['requests'],
+            },
+            'endpoints': results,
+        }
+        self.print_report(results, options.get('compare'))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write('Wrote {}'.format(options['output']))
+
+    def endpoints(self):
+        anonymous = Client()
+        author = Client()
+        author.force_login(User.objects.get(username='bench'))
+
+        posts = Post.objects.order_by('-created', '-pk')
+        total = posts.count()
+        middle = posts[total // 2]
+        category = Category.objects.order_by('pk').first()
+        tag = Tag.objects.order_by('pk').first()
+        return {
+            'PostList': ('GET', '/blog/', anonymous),
+            'PostList (deep keyset page)': ('GET', '/blog/?after={}'.format(encode_cursor(middle)), anonymous),
+            'PostList (deep offset page)': ('GET', '/blog/?page={}'.format(max(1, total // 10)), anonymous),
+            'PostListByCategory': ('GET', category.get_absolute_url(), anonymous),
+            'PostListByTag': ('GET', tag.get_absolute_url(), anonymous),
+            'PostDetail': ('GET', middle.get_absolute_url(), anonymous),
+            'PostDetail (logged in)': ('GET', middle.get_absolute_url(), author),
+            'PostSearch': ('GET', '/blog/search/python/', anonymous),
+            'new_comment': ('POST', middle.get_absolute_url() + 'new_comment/', author),
+        }
+
+    def request(self, client, method, url):
+        if method == 'POST':
+            return client.post(url, {'text': 'benchmark comment'})
+        return client.get(url)
+
+    def measure(self, client, method, url, options, clear_cache):
+        timings = []
+        queries = []
+        status = None
+        if not clear_cache:
+            cache.clear()
+            self.request(client, method, url)
+        for _ in range(options['requests']):
+            if clear_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, method, url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            status = response.status_code
+
+        # tracemalloc 은 느려서 latency 와 따로 잰다.
+        peaks = []
+        retained = []
+        tracemalloc.start()
+        try:
+            for _ in range(options['alloc_requests']):
+                if clear_cache:
+                    cache.clear()
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                self.request(client, method, url)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': method,
+            'url': url,
+            'status': status,
+            'requests': len(timings),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p90_ms': round(percentile(timings, 90), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+            'alloc_peak_kb': round(statistics.mean(peaks) / 1024, 1) if peaks else None,
+            'alloc_retained_kb': round(statistics.mean(retained) / 1024, 1) if retained else None,
+        }
+
+    def print_report(self, results, compare):
+        previous = {}
+        if compare:
+            with open(compare) as f:
+                previous = json.load(f)['endpoints']
+
+        self.stdout.write('\n{:<36} {:>6} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+            'endpoint', 'status', 'p50 ms', 'p90 ms', 'p99 ms', 'queries', 'alloc KB'))
+        for name, result in results.items():
+            line = '{:<36} {:>6} {:>9.2f} {:>9.2f} {:>9.2f} {:>8.1f} {:>10}'.format(
+                name, result['status'], result['p50_ms'], result['p90_ms'], result['p99_ms'],
+                result['queries_mean'], result['alloc_peak_kb'],
+            )
+            if name in previous and previous[name]['p50_ms']:
+                change = (result['p50_ms'] - previous[name]['p50_ms']) / previous[name]['p50_ms'] * 100
+                line += '  p50 {:+.1f}%'.format(change)
+            self.stdout.write(line)
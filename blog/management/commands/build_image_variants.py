@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog import tasks
+from blog.images import build_head_image_variants
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Generate resized/WebP variants for existing Post.head_image files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate variants even for posts that already have them.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(Q(head_image='') | Q(head_image__isnull=True))
+        if not options['force']:
+            posts = posts.filter(head_image_variants={})
+        post_ids = list(posts.order_by('pk').values_list('pk', flat=True))
+
+        if not tasks.is_eager():
+            # run_tasks worker 가 만든다. 이미 대기 중인 post 는 다시 넣지 않는다.
+            queued = sum(1 for post_id in post_ids if tasks.head_image_variants.enqueue(post_id))
+            self.stdout.write('Queued variants for {} of {} posts.'.format(queued, len(post_ids)))
+            return
+
+        built = failed = 0
+        for post_id in post_ids:
+            try:
+                if build_head_image_variants(post_id):
+                    built += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write('Post {}: {}'.format(post_id, e))
+
+        self.stdout.write('Built variants for {} of {} posts ({} failed).'.format(built, len(post_ids), failed))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import related
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed related posts (blog.related) for every post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, help='Neighbours per post (default: BLOG_RELATED_POSTS).')
+        parser.add_argument('--content-terms', type=int,
+                            help='Also use this many top TF-IDF content terms per post '
+                                 '(default: BLOG_RELATED_CONTENT_TERMS).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = related.build_related(k=options['k'], content_terms=options['content_terms'])
+        self.stdout.write('Updated related posts of {} posts in {:.1f}s ({}).'.format(
+            changed, time.perf_counter() - started, 'numpy' if related.np is not None else 'pure Python'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Write the changed sitemap shards and the sitemap index (blog.sitemaps) to BLOG_SITEMAP_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rewrite every shard, not only the changed ones.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = sitemaps.build_sitemaps(full=options['full'])
+        self.stdout.write('Wrote {} sitemap shards in {:.1f}s to {}.'.format(
+            built, time.perf_counter() - started, sitemaps.get_root()))
@@ -0,0 +1,25 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blog.archive import export_records, write_records
+
+
+class Command(BaseCommand):
+    help = 'Stream categories, tags, posts and comments to a JSON Lines file (use .gz to compress).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        records = export_records(batch_size=options['batch_size'])
+        path = options['path']
+        if path == '-':
+            count = write_records(records, sys.stdout)
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'wt', encoding='utf-8') as stream:
+                count = write_records(records, stream)
+            self.stdout.write('Exported {} records to {}.'.format(count, path))
@@ -0,0 +1,65 @@
+import gzip
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import tasks
+from blog.archive import Importer, read_records
+from blog.cache import bump
+from blog.counters import recount_categories, recount_tags, recount_comments
+from blog.related import build_related
+from blog.search import get_search_backend
+from blog.sitemaps import discover_shards
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load a JSON Lines archive written by export_blog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archive file (.jsonl or .jsonl.gz), or '-' for stdin.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-final', action='store_true',
+            help='Only load rows; skip Markdown rendering, counters and the search index.',
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(batch_size=options['batch_size'])
+        path = options['path']
+        try:
+            if path == '-':
+                self.load(importer, sys.stdin)
+            else:
+                opener = gzip.open if path.endswith('.gz') else open
+                with opener(path, 'rt', encoding='utf-8') as stream:
+                    self.load(importer, stream)
+        except (KeyError, ValueError) as e:
+            raise CommandError('Import failed after {}: {!r}'.format(importer.counts, e))
+        importer.reset_sequences()
+        self.stdout.write('Imported {}.'.format(importer.counts))
+
+        if not options['skip_final']:
+            self.finish(options)
+
+    def load(self, importer, stream):
+        for record in read_records(stream):
+            importer.add(record)
+        importer.flush()
+
+    def finish(self, options):
+        # bulk_create 는 save()/signal 을 거치지 않으므로 파생 데이터를 한 번에 만든다.
+        call_command('rebuild_markdown', batch_size=options['batch_size'], stdout=self.stdout)
+        recount_categories()
+        recount_tags()
+        recount_comments()
+        get_search_backend().rebuild()
+        build_related()
+        bump('list', 'sidebar')
+        # 모든 sitemap shard 를 다시 쓰도록 표시한다 (eager 모드에서는 build_sitemaps 가 쓴다).
+        discover_shards()
+        if not tasks.is_eager():
+            tasks.update_sitemaps.enqueue()
+        self.stdout.write('Rendered Markdown, recounted counters, rebuilt the search index and related posts.')
+        self.stdout.write('Run build_image_variants to create head image variants'
+                          + (' and build_sitemaps to write the sitemaps.' if tasks.is_eager() else '.'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from blog.cache import bump
+from blog.models import Post, Tag
+from blog.rendering import RENDERER_VERSION
+from blog.signals import posts_category_groups, tag_groups, touch_posts
+
+
+class Command(BaseCommand):
+    help = 'Re-render stale Post.content_html in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Check every post, including rows whose content was changed without save().',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        posts = Post.objects.only('pk', 'content', 'content_html_stamp').order_by('pk')
+        if not options['all']:
+            # 렌더러 버전이 다른 row 만 DB에서 골라낸다.
+            posts = posts.exclude(content_html_stamp__startswith=RENDERER_VERSION + ':')
+
+        checked = rebuilt = 0
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            checked += 1
+            if post.render_markdown_content():
+                batch.append(post)
+            if len(batch) >= batch_size:
+                rebuilt += self.flush(batch)
+        rebuilt += self.flush(batch)
+
+        self.stdout.write('Checked {} posts, rebuilt {}.'.format(checked, rebuilt))
+
+    def flush(self, batch):
+        count = len(batch)
+        if batch:
+            Post.objects.bulk_update(batch, ['content_html', 'content_html_stamp', 'excerpt'])
+            # bulk_update 는 post_save 를 보내지 않으므로 modified (post 카드, sitemap) 와 page cache 도 여기서
+            post_ids = [post.pk for post in batch]
+            touch_posts(Post.objects.filter(pk__in=post_ids))
+            tags = Tag.objects.filter(post__in=post_ids).distinct().values_list('slug', flat=True)
+            bump('list', 'sidebar', *posts_category_groups(post_ids), *tag_groups(tags),
+                 *['post:{}'.format(pk) for pk in post_ids])
+            batch.clear()
+        return count
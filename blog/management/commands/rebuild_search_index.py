@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog search index from the Post table.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write('Rebuilt search index with {}.'.format(type(backend).__name__))
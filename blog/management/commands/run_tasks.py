@@ -0,0 +1,92 @@
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog.tasks import claim, execute, finish, release, requeue_stale
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued blog jobs (blog.tasks: Markdown rendering, search indexing, image variants) '
+        'in a process pool until interrupted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=getattr(settings, 'BLOG_TASKS_PROCESSES', 2),
+                            help='Worker processes. 0 runs the jobs in this process.')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds after which a job left running by a dead worker is retried.')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is ready to run.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write('Requeued {} stale jobs.'.format(requeued))
+
+        self.done = self.failed = 0
+        try:
+            if options['processes'] <= 0:
+                self.run_inline(options)
+            else:
+                self.run_pool(options)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('Ran {} jobs, {} failed.'.format(self.done, self.failed))
+
+    def record(self, job, error):
+        if finish(job, error):
+            self.done += 1
+        else:
+            self.failed += 1
+            self.stderr.write('{} (attempt {}/{}): {}'.format(
+                job, job.attempts, job.max_attempts, error.strip().splitlines()[-1]))
+
+    def run_inline(self, options):
+        while True:
+            jobs = claim(1)
+            if not jobs:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            try:
+                execute(jobs[0].name, jobs[0].args)
+            except Exception:
+                self.record(jobs[0], traceback.format_exc())
+            else:
+                self.record(jobs[0], None)
+
+    def run_pool(self, options):
+        processes = options['processes']
+        running = {}
+        # fork 된 process 가 이 process 의 DB 연결을 같이 쓰지 않도록 spawn 하고, 각자 django.setup() 한다.
+        connections.close_all()
+        pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+        try:
+            while True:
+                if len(running) < processes:
+                    for job in claim(processes - len(running)):
+                        running[pool.submit(execute, job.name, job.args)] = job
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        # worker 의 traceback 은 __cause__ 로 붙어 온다.
+                        error = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+                    self.record(job, error)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            release(running.values())
@@ -0,0 +1,111 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from blog.bench import seed, temporary_sqlite
+from blog.models import Post
+
+# 캐시 없이 DB 만 부하를 받도록
+STRESS_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer new_comment and PostList from parallel threads against a throwaway SQLite '
+        'database and report throughput, latency and lock errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run.')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Share of requests that post a comment.')
+        parser.add_argument(
+            '--journal-mode', choices=['wal', 'delete'], default='wal',
+            help="'delete' runs with SQLite's default rollback journal for comparison.",
+        )
+        parser.add_argument('--min-rps', type=float, default=0, help='Fail if total throughput is lower.')
+
+    def handle(self, *args, **options):
+        with temporary_sqlite('default'), \
+                override_settings(CACHES=STRESS_CACHES, DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            settings_dict = connections.databases['default']
+            if options['journal_mode'] == 'delete':
+                settings_dict['SQLITE_PRAGMAS'] = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+                settings_dict['OPTIONS'] = dict(settings_dict.get('OPTIONS', {}), timeout=5)
+            connection.close()
+
+            seed(posts=options['posts'])
+            post_ids = list(Post.objects.values_list('pk', flat=True))
+            user = User.objects.get(username='bench')
+            connection.close()
+
+            results = defaultdict(list)
+            errors = defaultdict(int)
+            lock = threading.Lock()
+            deadline = time.perf_counter() + options['duration']
+
+            def worker(number):
+                rng = random.Random(number)
+                client = Client(raise_request_exception=False)
+                client.force_login(user)
+                timings = defaultdict(list)
+                failures = defaultdict(int)
+                try:
+                    while time.perf_counter() < deadline:
+                        if rng.random() < options['write_ratio']:
+                            kind = 'new_comment'
+                            url = '/blog/{}/new_comment/'.format(rng.choice(post_ids))
+                            started = time.perf_counter()
+                            response = client.post(url, {'text': 'stress {}'.format(number)})
+                            ok = response.status_code == 302
+                        else:
+                            kind = 'PostList'
+                            started = time.perf_counter()
+                            response = client.get('/blog/')
+                            ok = response.status_code == 200
+                        if ok:
+                            timings[kind].append((time.perf_counter() - started) * 1000)
+                        else:
+                            failures[kind] += 1
+                finally:
+                    # thread 마다 열린 DB 연결
+                    connection.close()
+                with lock:
+                    for kind, values in timings.items():
+                        results[kind] += values
+                    for kind, count in failures.items():
+                        errors[kind] += count
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['workers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        total = sum(len(values) for values in results.values())
+        self.stdout.write('{} workers, {:.1f}s, journal_mode={}'.format(
+            options['workers'], elapsed, options['journal_mode']))
+        for kind in ('PostList', 'new_comment'):
+            values = sorted(results[kind])
+            if not values:
+                self.stdout.write('{:<12} no successful requests, {} errors'.format(kind, errors[kind]))
+                continue
+            self.stdout.write('{:<12} {:>8.1f} req/s  p50 {:>7.1f} ms  p99 {:>7.1f} ms  errors {}'.format(
+                kind, len(values) / elapsed, statistics.median(values),
+                values[min(len(values) - 1, int(len(values) * 0.99))], errors[kind],
+            ))
+        rps = total / elapsed
+        self.stdout.write('total        {:>8.1f} req/s'.format(rps))
+        if rps < options['min_rps']:
+            raise CommandError('Throughput {:.1f} req/s is below --min-rps {}'.format(rps, options['min_rps']))
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite primary database onto the SQLite replicas in DATABASE_REPLICAS '
+        '(for trying out replica routing locally).'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replicas only copies SQLite databases; use the server\'s replication.')
+
+        primary.ensure_connection()
+        for alias in getattr(settings, 'DATABASE_REPLICAS', []):
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError('Replica {!r} is not SQLite.'.format(alias))
+            replica.close()
+            # online backup API: primary 에 쓰는 중이어도 일관된 snapshot 을 복사한다.
+            target = sqlite3.connect(str(replica.settings_dict['NAME']))
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write('Copied default -> {} ({})'.format(alias, replica.settings_dict['NAME']))
@@ -0,0 +1,93 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+# 현재 요청의 RequestMetrics (blog/middleware.py 가 sample 된 요청에만 설정한다)
+_current = ContextVar('blog_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.timings = Counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries = Counter()
+        self.statements = Counter()
+
+    def add_time(self, name, seconds):
+        self.timings[name] += seconds
+
+    def add_query(self, sql, params, seconds):
+        self.query_count += 1
+        self.query_time += seconds
+        self.statements[sql] += 1
+        try:
+            self.queries[(sql, repr(params))] += 1
+        except Exception:
+            pass
+
+    @property
+    def duplicate_queries(self):
+        # 같은 SQL + 같은 parameter 를 다시 실행한 횟수
+        return sum(count - 1 for count in self.queries.values())
+
+    def repeated_statements(self, threshold=3):
+        # parameter 만 다른 같은 SQL 이 여러 번 = N+1 의심
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    # 모든 DB connection 에 한 번 설치된다 (install_query_wrapper). sample 되지 않은 요청에서는 그대로 실행.
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.add_query(sql, params, time.perf_counter() - started)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # connection_created receiver (blog/apps.py). 같은 connection 이 다시 연결될 때 중복되지 않도록.
+    # async view 의 executor thread 에서 실행된 쿼리도 contextvar 로 같은 요청에 기록된다.
+    # connection.execute_wrapper() 는 마지막 것을 pop() 하므로 맨 앞에 넣는다.
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_wrapper)
+
+
+class timed:
+    """
+    with timed('markdown'): ...
+    sample 되지 않은 요청(또는 요청 밖)에서는 시간만 한 번 확인하고 아무것도 하지 않는다.
+    """
+    __slots__ = ('name', 'metrics', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.metrics = _current.get()
+        if self.metrics is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.metrics is not None:
+            self.metrics.add_time(self.name, time.perf_counter() - self.started)
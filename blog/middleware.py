@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import random
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger('blog.metrics')
+
+
+class RequestMetricsMiddleware:
+    """
+    sample 된 요청(settings.BLOG_METRICS_SAMPLE_RATE)마다 view, 전체/template/Markdown 시간,
+    DB 쿼리 수/시간, 중복 쿼리를 모아서 Server-Timing header 와 'blog.metrics' log 로 남긴다.
+    sample 되지 않은 요청은 random() 한 번만 하고 그대로 통과한다.
+    DB 쿼리는 blog.metrics.query_wrapper 가 기록한다. MIDDLEWARE 의 맨 앞에 둔다.
+    WSGI / ASGI(async view) 둘 다에서 동작한다.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Django 가 이 middleware 를 async 로 부르도록
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def sample(self):
+        rate = getattr(settings, 'BLOG_METRICS_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.sample():
+            return self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        self.report(request, response, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sample():
+            return await self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        self.report(request, response, request_metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            view = getattr(view_func, 'view_class', view_func)
+            request_metrics.view = '{}.{}'.format(view.__module__, view.__qualname__)
+
+    def process_template_response(self, request, response):
+        # TemplateResponse 는 middleware 를 다 지난 뒤 render() 된다.
+        if metrics.current() is not None:
+            render = response.render
+
+            def timed_render():
+                with metrics.timed('template'):
+                    return render()
+            response.render = timed_render
+        return response
+
+    def report(self, request, response, request_metrics):
+        total = request_metrics.total()
+        timings = {
+            'total': total,
+            'db': request_metrics.query_time,
+            'template': request_metrics.timings['template'],
+            'markdown': request_metrics.timings['markdown'],
+        }
+        if getattr(settings, 'BLOG_METRICS_SERVER_TIMING', True):
+            # template 안에서 실행된 쿼리/Markdown 은 template 시간에도 포함된다.
+            # async view 는 쿼리를 동시에 실행하므로 db 합계가 total 보다 클 수 있다.
+            response['Server-Timing'] = ', '.join(
+                '{};dur={:.1f}'.format(name, seconds * 1000) + (
+                    ';desc="{} queries"'.format(request_metrics.query_count) if name == 'db' else ''
+                )
+                for name, seconds in timings.items()
+            )
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': request_metrics.view,
+            'queries': request_metrics.query_count,
+            'duplicate_queries': request_metrics.duplicate_queries,
+            'repeated_statements': {
+                sql[:200]: count for sql, count in request_metrics.repeated_statements().items()
+            },
+        }
+        record.update({name + '_ms': round(seconds * 1000, 2) for name, seconds in timings.items()})
+        logger.info(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,37 @@
+from django.db import migrations, OperationalError
+
+
+def create_fts_table(apps, schema_editor):
+    # blog.search.SQLiteFTS5Backend 의 색인 테이블. SQLite 가 아니거나
+    # FTS5 trigram tokenizer 가 없는 빌드(3.34 미만)면 만들지 않는다 (ContainsSearchBackend 로 대체).
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts "
+                "USING fts5(title, content, tokenize='trigram')"
+            )
+        except OperationalError:
+            return
+        cursor.execute('DELETE FROM blog_post_fts')
+        cursor.execute('INSERT INTO blog_post_fts(rowid, title, content) SELECT id, title, content FROM blog_post')
+
+
+def drop_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS blog_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
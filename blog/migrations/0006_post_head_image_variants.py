@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='head_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+import html
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from markdownx.utils import markdown
+
+
+def fill_excerpt(apps, schema_editor):
+    # blog.rendering.make_excerpt 와 같은 규칙 (migration 은 현재 코드에 의존하지 않도록 복사)
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.using(schema_editor.connection.alias).only('pk', 'content', 'content_html')
+    batch = []
+    for post in posts.iterator(chunk_size=500):
+        # 0002 는 content_html 을 채우지 않았으므로 그 전에 쓴 글은 content 를 렌더링한다.
+        # (content_html 은 그대로 두고, 처음 읽을 때 Post.get_markdown_content() 가 채운다)
+        content_html = post.content_html or markdown(post.content)
+        text = html.unescape(strip_tags(content_html))
+        post.excerpt = Truncator(' '.join(text.split())).words(50)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.using(schema_editor.connection.alias).bulk_update(batch, ['excerpt'])
+            batch = []
+    if batch:
+        Post.objects.using(schema_editor.connection.alias).bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_head_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_excerpt, migrations.RunPython.noop),
+    ]
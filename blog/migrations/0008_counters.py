@@ -0,0 +1,46 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count(queryset, field):
+    rows = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    # blog.counters 의 recount_* 와 같은 UPDATE
+    db = schema_editor.connection.alias
+    Post = apps.get_model('blog', 'Post')
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    Comment = apps.get_model('blog', 'Comment')
+    Category.objects.using(db).update(post_count=count(Post.objects.using(db), 'category'))
+    Tag.objects.using(db).update(post_count=count(Post.tags.through.objects.using(db), 'tag'))
+    Post.objects.using(db).update(comment_count=count(Comment.objects.using(db), 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_relatedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=20)),
+                ('number', models.PositiveIntegerField()),
+                ('generation', models.PositiveIntegerField(default=1)),
+                ('built_generation', models.PositiveIntegerField(default=0)),
+                ('urls', models.PositiveIntegerField(default=0)),
+                ('lastmod', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sitemapshard',
+            constraint=models.UniqueConstraint(fields=('section', 'number'), name='blog_sitemapshard_number'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_sitemapshard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['modified'], name='blog_post_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', 'modified'], name='blog_post_cat_modified_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+import re
+
+from django.db import migrations, OperationalError
+
+WORD_RE = re.compile(r'\w+')
+
+
+def short_terms(*texts):
+    # blog.search.short_terms 와 같다.
+    terms = set()
+    for text in texts:
+        for word in WORD_RE.findall(text.lower()):
+            terms.update(word)
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    return ' '.join(sorted(terms))
+
+
+def create_short_table(apps, schema_editor):
+    # blog.search.SQLiteFTS5Backend 가 3글자 미만 검색어에 쓰는 테이블.
+    # 단어의 1, 2글자 조각을 공백으로 이어 저장한다. 위치 정보는 필요 없어서 detail=none.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('blog', 'Post')
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts_short "
+                "USING fts5(terms, tokenize=\"unicode61 remove_diacritics 0 tokenchars '_'\", detail=none)"
+            )
+        except OperationalError:
+            return
+        cursor.execute('DELETE FROM blog_post_fts_short')
+        posts = Post.objects.order_by().values_list('pk', 'title', 'content').iterator(chunk_size=2000)
+        cursor.executemany(
+            'INSERT INTO blog_post_fts_short(rowid, terms) VALUES (%s, %s)',
+            ((pk, short_terms(title, content)) for pk, title, content in posts),
+        )
+
+
+def drop_short_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS blog_post_fts_short')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_post_modified_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_short_table, drop_short_table),
+    ]
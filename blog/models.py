@@ -1,7 +1,22 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.core.cache import cache
 from markdownx.models import MarkdownxField
-from markdownx.utils import markdown
+
+from .rendering import comment_cache_key, comment_cache_timeout, content_stamp, make_excerpt, render_markdown
+
+def exclude_counters(instance, counter_fields, kwargs):
+    # 개수 column 은 F() 로만 바뀐다. 예전에 읽은 인스턴스를 save() 해도 덮어쓰지 않도록
+    # 기존 row 는 개수 column 을 뺀 update_fields 로 저장한다.
+    if instance._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return
+    skip = set(counter_fields) | instance.get_deferred_fields()
+    kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in skip and field.attname not in skip
+    ]
 
 # Create your models here.
 class Category(models.Model):
@@ -9,10 +24,16 @@ class Category(models.Model):
     description = models.TextField(blank=True)
 
     slug = models.SlugField(unique=True, allow_unicode=True)
+    # blog/counters.py
+    post_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        exclude_counters(self, ['post_count'], kwargs)
+        super(Category, self).save(*args, **kwargs)
+
     def get_absolute_url(self):
         return '/blog/category/{}/'.format(self.slug)
 
@@ -22,29 +43,66 @@ class Category(models.Model):
 class Tag(models.Model):
     name = models.CharField(max_length=40, unique=True)
     slug = models.SlugField(unique=True, allow_unicode=True)
+    # blog/counters.py
+    post_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        exclude_counters(self, ['post_count'], kwargs)
+        super(Tag, self).save(*args, **kwargs)
+
     def get_absolute_url(self):
         return '/blog/tag/{}/'.format(self.slug)
 
+class PostQuerySet(models.QuerySet):
+    def with_relations(self):
+        # 카드/상세에서 쓰는 author, category, tags 를 고정된 쿼리 수로 가져온다.
+        return self.select_related('author', 'category').prefetch_related('tags')
+
+    def for_list(self):
+        # 카드에는 excerpt 만 쓰므로 본문 column 들은 읽지 않는다.
+        return self.with_relations().defer('content', 'content_html', 'content_html_stamp')
+
 class Post(models.Model):
     # title: blog title
     title = models.CharField(max_length=30)
     content = MarkdownxField()
-    
+    # content 를 렌더링한 HTML 캐시. content_html_stamp 가 content_stamp(content) 와 같을 때만 유효
+    content_html = models.TextField(blank=True, editable=False)
+    content_html_stamp = models.CharField(max_length=64, blank=True, editable=False)
+    # 목록 카드용 plain text 요약. content_html 과 같이 갱신된다.
+    excerpt = models.TextField(blank=True, editable=False)
+
     head_image = models.ImageField(upload_to='blog/%Y/%m/%d/', blank=True)
+    # blog/images.py 가 만든 리사이즈/WebP 파일들 {variant: {'width', 'jpeg', 'webp'}}
+    head_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     #created : when
     created = models.DateTimeField(auto_now_add=True)
+    # 카드 fragment cache 의 version. tag/category 가 바뀌어도 갱신된다 (blog/signals.py)
+    modified = models.DateTimeField(auto_now=True)
     #만약 다른 유저가 글을올리고 계정을 삭제하면 글도 삭제 = True
     author = models.ForeignKey(User, on_delete=models.CASCADE)
 
     category = models.ForeignKey(Category, blank=True, null=True, on_delete=models.SET_NULL)
     tags = models.ManyToManyField(Tag, blank=True)
+    # blog/counters.py
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created', ]
+        indexes = [
+            # PostList 의 keyset pagination (ORDER BY created DESC, id DESC)
+            models.Index(fields=['-created', '-id'], name='blog_post_created_id_idx'),
+            # PostListByCategory: WHERE category_id = ? ORDER BY created DESC, id DESC
+            models.Index(fields=['category', '-created', '-id'], name='blog_post_cat_created_idx'),
+            # 목록 / feed 의 Last-Modified: MAX(modified) (WHERE category_id = ?)
+            models.Index(fields=['modified'], name='blog_post_modified_idx'),
+            models.Index(fields=['category', 'modified'], name='blog_post_cat_modified_idx'),
+        ]
 
     def __str__(self) -> str:
         return '{} :: {}'.format(self.title, self.author)
@@ -55,8 +113,56 @@ class Post(models.Model):
     def get_update_url(self):
         return self.get_absolute_url() + 'update/'
 
+    def render_markdown_content(self):
+        # 저장된 HTML이 stale 일 때만 다시 렌더링한다. 렌더링했으면 True
+        stamp = content_stamp(self.content)
+        if stamp == self.content_html_stamp:
+            return False
+        self.content_html = render_markdown(self.content)
+        self.content_html_stamp = stamp
+        self.excerpt = make_excerpt(self.content_html)
+        return True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Post, cls).from_db(db, field_names, values)
+        # 저장할 때 category / head_image 가 바뀌었는지 알 수 있도록 (blog/signals.py)
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_head_image = instance.__dict__.get('head_image')
+        return instance
+
+    def head_image_changed(self):
+        if 'head_image' not in self.__dict__:
+            # defer 되어 읽지도 바꾸지도 않은 경우
+            return False
+        return (self.head_image.name or '') != (getattr(self, '_loaded_head_image', None) or '')
+
+    def markdown_is_stale(self):
+        # content 를 읽지 않았으면(defer) 바뀌지도 않았다.
+        return 'content' in self.__dict__ and content_stamp(self.content) != self.content_html_stamp
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # job queue 를 쓰면 렌더링은 worker 가 한다 (blog/tasks.py render_post).
+        # 그 전까지 상세 페이지는 get_markdown_content() 로 바로 렌더링한다.
+        render_now = getattr(settings, 'BLOG_TASKS_EAGER', False)
+        if render_now and self.render_markdown_content() and update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'content_html', 'content_html_stamp', 'excerpt'}
+        if self.head_image_changed():
+            # 새 이미지의 variant 가 만들어질 때까지는 원본을 쓴다.
+            self.head_image_variants = {}
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'head_image_variants'}
+        exclude_counters(self, ['comment_count'], kwargs)
+        # post_save 의 개수 갱신(blog/signals.py)까지 한 transaction 으로
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Post, instance=self)):
+            super(Post, self).save(*args, **kwargs)
+        self._loaded_category_id = self.category_id
+
     def get_markdown_content(self):
-        return markdown(self.content)
+        # 렌더러가 업그레이드된 뒤 rebuild_markdown 이 아직 돌지 않았어도 항상 최신 HTML을 돌려준다.
+        self.render_markdown_content()
+        return self.content_html
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
@@ -65,9 +171,113 @@ class Comment(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at'], name='blog_comment_post_created_idx'),
+        ]
+
+    _markdown_content = None
+
+    def save(self, *args, **kwargs):
+        # post_save 의 Post.comment_count 갱신(blog/signals.py)까지 한 transaction 으로
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Comment, instance=self)):
+            super(Comment, self).save(*args, **kwargs)
+
     def get_markdown_content(self):
-        return markdown(self.text)
+        if self._markdown_content is None:
+            Comment.render_markdown_bulk([self])
+        return self._markdown_content
+
+    @classmethod
+    def render_markdown_bulk(cls, comments):
+        # 한 페이지의 댓글을 cache.get_many / set_many 한 번씩으로 렌더링한다.
+        # 렌더링 결과는 인스턴스에도 남아서 template 에서 여러 번 호출해도 다시 파싱하지 않는다.
+        keys = {}
+        for comment in comments:
+            if comment._markdown_content is not None:
+                continue
+            if comment.pk is None or comment.modified_at is None:
+                comment._markdown_content = render_markdown(comment.text)
+            else:
+                keys[comment_cache_key(comment)] = comment
+
+        if keys:
+            cached = cache.get_many(list(keys))
+            missing = {}
+            for key, comment in keys.items():
+                if key in cached:
+                    comment._markdown_content = cached[key]
+                else:
+                    comment._markdown_content = missing[key] = render_markdown(comment.text)
+            if missing:
+                cache.set_many(missing, comment_cache_timeout())
+
+        return comments
     
     def get_absolute_url(self):
-        return self.post.get_absolute_url() + '#comment-id-{}'.format(self.pk)
\ No newline at end of file
+        return self.post.get_absolute_url() + '#comment-id-{}'.format(self.pk)
+
+class RelatedPost(models.Model):
+    # blog/related.py 가 미리 계산한 post 별 관련 글 top-K (rank 0 이 가장 가까운 글)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # PostDetail: WHERE post_id = ? ORDER BY rank
+            models.UniqueConstraint(fields=['post', 'rank'], name='blog_relatedpost_rank'),
+        ]
+
+class SitemapShard(models.Model):
+    # blog/sitemaps.py 가 쓴 sitemap 파일 하나: section 의 pk 범위 [number * size, (number + 1) * size)
+    section = models.CharField(max_length=20)
+    number = models.PositiveIntegerField()
+    # 내용이 바뀔 때마다 generation 이 올라간다. 파일에 반영된 generation 이 built_generation
+    generation = models.PositiveIntegerField(default=1)
+    built_generation = models.PositiveIntegerField(default=0)
+    urls = models.PositiveIntegerField(default=0)
+    lastmod = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'number'], name='blog_sitemapshard_number'),
+        ]
+
+    def __str__(self):
+        return '{}-{}'.format(self.section, self.number)
+
+class Job(models.Model):
+    # blog/tasks.py 의 DB job queue. 성공한 job 은 지워지고 실패한 job 만 남는다.
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    # 같은 key 의 pending job 은 하나만 (예: 'blog.render_post:12'). None 이면 중복 제거 안 함
+    key = models.CharField(max_length=200, null=True, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # worker: WHERE status = 'pending' AND run_after <= now ORDER BY priority DESC, run_after
+            models.Index(fields=['status', '-priority', 'run_after'], name='blog_job_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='pending'), name='blog_job_pending_key'),
+        ]
+
+    def __str__(self):
+        return '{}{} [{}]'.format(self.name, tuple(self.args), self.status)
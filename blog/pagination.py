@@ -0,0 +1,116 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q, QuerySet
+from django.http import Http404
+
+
+def encode_cursor(post):
+    value = '{},{}'.format(post.created.isoformat(), post.pk)
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created, pk = value.rsplit(',', 1)
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise Http404('Invalid cursor.')
+
+
+class KeysetPage:
+    # (created, pk) 기준 keyset page. Django Page 와 달리 전체 개수/페이지 번호가 없다.
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_page_url(self):
+        # Older: 이 페이지의 마지막 글 다음부터
+        return '?after={}'.format(encode_cursor(self.object_list[-1]))
+
+    @property
+    def previous_page_url(self):
+        # Newer: 이 페이지의 첫 글 이전까지
+        return '?before={}'.format(encode_cursor(self.object_list[0]))
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """
+    ?page=N (OFFSET + COUNT(*)) 대신 ?after=<cursor> / ?before=<cursor> 로 (created, pk)
+    index 를 따라가며 페이지를 나눈다. 예전 ?page=N 링크는 그대로 offset 방식으로 동작한다.
+    """
+    paginate_by = 5
+
+    def paginate_queryset(self, queryset, page_size):
+        # 검색 결과(SearchResults)는 이미 순위가 매겨진 작은 id 목록이라 offset 으로 충분하다.
+        if self.page_kwarg in self.request.GET or not isinstance(queryset, QuerySet):
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+
+        if before:
+            created, pk = decode_cursor(before)
+            rows = list(
+                queryset.filter(created__gte=created)
+                .filter(Q(created__gt=created) | Q(created=created, pk__gt=pk))
+                .order_by('created', 'pk')[:page_size + 1]
+            )
+            has_previous = len(rows) > page_size
+            object_list = rows[:page_size][::-1]
+            has_next = True
+        else:
+            if after:
+                created, pk = decode_cursor(after)
+                # created__lte 는 OR 조건과 중복이지만, 이게 있어야 (created, id) index 를 range 로 탄다.
+                queryset = queryset.filter(created__lte=created).filter(
+                    Q(created__lt=created) | Q(created=created, pk__lt=pk)
+                )
+            rows = list(queryset.order_by('-created', '-pk')[:page_size + 1])
+            has_next = len(rows) > page_size
+            object_list = rows[:page_size]
+            has_previous = bool(after)
+
+        if not object_list and (after or before):
+            raise Http404('Invalid cursor.')
+
+        page = KeysetPage(object_list, has_next, has_previous)
+        return (None, page, object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super(KeysetPaginationMixin, self).get_context_data(**kwargs)
+        context.update(page_urls(context.get('page_obj')))
+        return context
+
+
+def page_urls(page):
+    # post_list.html 의 Older / Newer 링크
+    if isinstance(page, KeysetPage):
+        return {
+            'next_page_url': page.next_page_url if page.has_next() else None,
+            'previous_page_url': page.previous_page_url if page.has_previous() else None,
+        }
+    if page is not None:
+        return {
+            'next_page_url': '?page={}'.format(page.next_page_number()) if page.has_next() else None,
+            'previous_page_url': '?page={}'.format(page.previous_page_number()) if page.has_previous() else None,
+        }
+    return {}
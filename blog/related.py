@@ -0,0 +1,233 @@
+"""
+PostDetail 의 관련 글.
+
+post 마다 tag / category (선택: 본문 TF-IDF 상위 단어) 를 feature 로 하는 sparse vector 를 만들고
+흔한 feature 일수록 가볍게 (Adamic-Adar) 겹침 점수를 매겨서 상위 BLOG_RELATED_POSTS 개를 RelatedPost 에 저장한다.
+
+    score(p, q) = sum(1 / log(1 + df(f)) for f in features(p) & features(q))
+
+점수는 공유하는 feature 의 df 에만 달려 있어서 (전체 글 수와 무관), tag/category 하나가 바뀌면
+그 feature 를 가진 post 들의 목록만 다시 계산하면 전체 계산과 같은 결과가 된다.
+
+- build_related(): 전체 (`manage.py build_related_posts`, import_blog)
+- update_related(kind, pk): post / tag / category 가 바뀐 뒤 (blog/signals.py -> blog/tasks.py)
+- related_posts(post_id): 상세 페이지. (post, rank) index 로 한 쿼리
+
+점수 계산은 feature 별 posting 을 이어 붙여 numpy bincount 로 더한다 (numpy 가 없으면 dict 로).
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+try:
+    import numpy as np
+except ImportError:  # 순수 Python 으로 계산 (느리지만 결과는 같다)
+    np = None
+
+from .cache import bump
+from .inverted_index import document_terms
+from .models import Post, RelatedPost
+
+BATCH_SIZE = 500
+
+PostTag = Post.tags.through
+
+
+def get_top_k():
+    return getattr(settings, 'BLOG_RELATED_POSTS', 5)
+
+
+def get_content_terms():
+    return getattr(settings, 'BLOG_RELATED_CONTENT_TERMS', 0)
+
+
+def feature_weight(df):
+    # 한 글에만 있는 feature 는 관련 글을 만들지 못하고, 너무 많은 글에 붙은 feature 는 구별력보다 비용이 크다.
+    if df < 2 or df > getattr(settings, 'BLOG_RELATED_MAX_POSTINGS', 1000):
+        return None
+    return 1 / math.log(1 + df)
+
+
+def ranked(scores, k):
+    # [(post_id, score)] 점수가 같으면 최근 글(pk 가 큰 것) 먼저
+    return heapq.nsmallest(k, ((post_id, round(score, 6)) for post_id, score in scores),
+                           key=lambda item: (-item[1], -item[0]))
+
+
+def related_posts(post_id):
+    entries = RelatedPost.objects.filter(post_id=post_id).order_by('rank').select_related('related').only(
+        'related', 'related__title', 'related__created',
+    )
+    return [entry.related for entry in entries]
+
+
+# 점수 계산
+
+def _neighbours_numpy(targets, features, postings, weights, k):
+    universe = sorted(set(targets).union(*(postings[f] for f in weights)))
+    ids = np.array(universe, dtype=np.int64)
+    position = {post_id: i for i, post_id in enumerate(universe)}
+    members = {f: np.array([position[p] for p in postings[f]], dtype=np.int64) for f in weights}
+    result = {}
+    for post_id in targets:
+        shared = [f for f in features[post_id] if f in weights]
+        if not shared:
+            result[post_id] = []
+            continue
+        # 이 post 의 feature 들의 posting 을 이어 붙여서 post 별로 weight 를 더한다.
+        candidates, inverse = np.unique(np.concatenate([members[f] for f in shared]), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.repeat(
+            [weights[f] for f in shared], [len(members[f]) for f in shared]))
+        keep = candidates != position[post_id]
+        candidates, scores = candidates[keep], np.round(scores[keep], 6)
+        order = np.lexsort((-ids[candidates], -scores))[:k]
+        result[post_id] = [(int(ids[c]), float(s)) for c, s in zip(candidates[order], scores[order])]
+    return result
+
+
+def _neighbours_python(targets, features, postings, weights, k):
+    result = {}
+    for post_id in targets:
+        scores = defaultdict(float)
+        for f in features[post_id]:
+            if f in weights:
+                for other in postings[f]:
+                    scores[other] += weights[f]
+        scores.pop(post_id, None)
+        result[post_id] = ranked(scores.items(), k)
+    return result
+
+
+def neighbours(targets, features, postings, k):
+    """
+    targets: 목록을 계산할 post id 들, features: {post_id: {feature}},
+    postings: {feature: [post_id]} (targets 의 feature 는 모두 있어야 한다)
+    """
+    weights = {}
+    for f, members in postings.items():
+        weight = feature_weight(len(members))
+        if weight is not None:
+            weights[f] = weight
+    compute = _neighbours_numpy if np is not None else _neighbours_python
+    return compute(sorted(targets), features, postings, weights, k)
+
+
+# feature 읽기  ('c', category_id) / ('t', tag_id) / ('w', 단어)
+
+def load_features(post_ids=None):
+    features = {}
+    posts = Post.objects.order_by().values_list('pk', 'category_id')
+    rows = PostTag.objects.order_by().values_list('post_id', 'tag_id')
+    chunks = [None] if post_ids is None else _chunks(post_ids)
+    for chunk in chunks:
+        for post_id, category_id in (posts if chunk is None else posts.filter(pk__in=chunk)).iterator():
+            features[post_id] = set() if category_id is None else {('c', category_id)}
+        for post_id, tag_id in (rows if chunk is None else rows.filter(post_id__in=chunk)).iterator():
+            features[post_id].add(('t', tag_id))
+    return features
+
+
+def load_postings(features):
+    # features 에 나온 tag/category 를 가진 모든 post
+    tag_ids = {f[1] for fs in features.values() for f in fs if f[0] == 't'}
+    category_ids = {f[1] for fs in features.values() for f in fs if f[0] == 'c'}
+    postings = defaultdict(list)
+    for chunk in _chunks(tag_ids):
+        for tag_id, post_id in PostTag.objects.filter(tag_id__in=chunk).values_list('tag_id', 'post_id').iterator():
+            postings[('t', tag_id)].append(post_id)
+    for chunk in _chunks(category_ids):
+        for category_id, post_id in Post.objects.filter(category_id__in=chunk).order_by().values_list(
+                'category_id', 'pk').iterator():
+            postings[('c', category_id)].append(post_id)
+    return postings
+
+
+def add_content_terms(features, count):
+    # 본문의 TF-IDF 상위 count 개 단어 (document frequency 를 먼저 한 번 센다)
+    posts = Post.objects.order_by().values_list('pk', 'title', 'content')
+    df = Counter()
+    for _, title, content in posts.iterator():
+        df.update(document_terms(title, content).keys())
+    n = max(len(features), 1)
+    for post_id, title, content in posts.iterator():
+        counts = document_terms(title, content)
+        best = heapq.nlargest(count, counts, key=lambda term: (counts[term] * math.log(n / df[term]), term))
+        features[post_id].update(('w', term) for term in best)
+
+
+# 계산 + 저장
+
+def build_related(k=None, content_terms=None):
+    """
+    모든 post 의 관련 글을 다시 계산해서 달라진 post 의 목록만 저장한다. 저장한 post 수를 돌려준다.
+    """
+    k = get_top_k() if k is None else k
+    content_terms = get_content_terms() if content_terms is None else content_terms
+    features = load_features()
+    if content_terms:
+        add_content_terms(features, content_terms)
+    postings = defaultdict(list)
+    for post_id in sorted(features):
+        for f in features[post_id]:
+            postings[f].append(post_id)
+    return save_changed(neighbours(features, features, postings, k))
+
+
+def recompute(post_ids):
+    # post_ids 의 목록만 전체 계산과 같은 방법으로 (tag/category posting 만 읽는다)
+    features = load_features(post_ids)
+    if not features:
+        return 0
+    return save_changed(neighbours(features, features, load_postings(features), get_top_k()))
+
+
+def update_related(kind, pk):
+    """
+    kind: 'post' (그 post 의 목록만), 'tag' / 'category' (그것을 가진 모든 post 의 목록)
+    본문 단어를 쓰는 경우(BLOG_RELATED_CONTENT_TERMS)에는 df 가 모든 글에 걸쳐 있어서 전체를 다시 계산한다.
+    """
+    if get_content_terms():
+        return build_related()
+    if kind == 'tag':
+        post_ids = PostTag.objects.filter(tag_id=pk).values_list('post_id', flat=True)
+    elif kind == 'category':
+        post_ids = Post.objects.filter(category_id=pk).values_list('pk', flat=True)
+    else:
+        post_ids = [pk]
+    return recompute(list(post_ids))
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def load_lists(post_ids):
+    lists = defaultdict(list)
+    for chunk in _chunks(post_ids):
+        rows = RelatedPost.objects.filter(post_id__in=chunk).order_by('post_id', 'rank')
+        for post_id, related_id, score in rows.values_list('post_id', 'related_id', 'score'):
+            lists[post_id].append((related_id, score))
+    return lists
+
+
+def save_changed(computed):
+    current = load_lists(computed)
+    changed = {post_id: entries for post_id, entries in computed.items() if entries != current.get(post_id, [])}
+    if not changed:
+        return 0
+    with transaction.atomic():
+        for chunk in _chunks(changed):
+            RelatedPost.objects.filter(post_id__in=chunk).delete()
+        RelatedPost.objects.bulk_create([
+            RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+            for post_id, entries in changed.items()
+            for rank, (related_id, score) in enumerate(entries)
+        ], batch_size=BATCH_SIZE)
+    # 상세 페이지의 page cache / ETag
+    bump(*['post:{}'.format(post_id) for post_id in changed])
+    return len(changed)
@@ -0,0 +1,65 @@
+import hashlib
+import html
+
+from django.conf import settings
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+import markdown as markdown_lib
+from markdownx.settings import (
+    MARKDOWNX_MARKDOWN_EXTENSIONS,
+    MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS,
+)
+from markdownx.utils import markdown
+
+from .metrics import timed
+
+# Markdown 렌더링 방식(확장, 설정, 후처리)을 바꿀 때 이 값을 올리면
+# 저장된 HTML이 전부 stale 처리되어 다시 렌더링된다.
+MARKDOWN_RENDER_REVISION = 1
+
+
+def _renderer_version():
+    signature = repr((
+        MARKDOWN_RENDER_REVISION,
+        markdown_lib.__version__,
+        list(MARKDOWNX_MARKDOWN_EXTENSIONS),
+        sorted(MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS.items(), key=lambda item: str(item[0])),
+    ))
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()[:12]
+
+
+RENDERER_VERSION = _renderer_version()
+
+
+def content_stamp(text):
+    # '<renderer version>:<content hash>' 형태.
+    # 앞부분만으로 렌더러 업그레이드 후 stale 인 row 를 DB에서 바로 찾을 수 있다.
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    return '{}:{}'.format(RENDERER_VERSION, digest)
+
+
+def render_markdown(text):
+    # 요청 metrics(blog/middleware.py)의 Server-Timing 'markdown'
+    with timed('markdown'):
+        return markdown(text)
+
+
+EXCERPT_WORDS = 50
+
+
+def make_excerpt(content_html, words=EXCERPT_WORDS):
+    # 렌더링된 HTML 에서 태그를 걷어낸 plain text (Markdown 문법이 그대로 보이지 않도록)
+    text = html.unescape(strip_tags(content_html))
+    return Truncator(' '.join(text.split())).words(words)
+
+
+def comment_cache_key(comment):
+    # 댓글은 수정될 때마다 modified_at 이 바뀌므로 revision 키로 쓴다.
+    return 'blog:comment-html:{}:{}:{}'.format(
+        RENDERER_VERSION, comment.pk, comment.modified_at.timestamp()
+    )
+
+
+def comment_cache_timeout():
+    return getattr(settings, 'BLOG_COMMENT_HTML_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
@@ -0,0 +1,230 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .inverted_index import InvertedIndex
+from .models import Post
+
+# post_id 순서가 곧 순위. snippet 은 escape 된 HTML (<mark> 로 강조) 이거나 None
+SearchHit = namedtuple('SearchHit', ['post_id', 'snippet'])
+
+WORD_RE = re.compile(r'\w+')
+
+
+def short_terms(*texts):
+    # 3글자 미만 검색어용 색인어: 단어마다 1글자, 2글자 조각 전부 (공백으로 구분)
+    terms = set()
+    for text in texts:
+        for word in WORD_RE.findall(text.lower()):
+            terms.update(word)
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    return ' '.join(sorted(terms))
+
+
+class BaseSearchBackend:
+    def search(self, query, limit):
+        raise NotImplementedError
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    # 예전 방식: title/content 에 LIKE '%q%' 전체 스캔
+    def search(self, query, limit):
+        post_ids = Post.objects.filter(
+            Q(title__contains=query) | Q(content__contains=query)
+        ).values_list('pk', flat=True)[:limit]
+        return [SearchHit(post_id, None) for post_id in post_ids]
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    # SQLite FTS5 역색인. trigram tokenizer 는 띄어쓰기/형태소와 상관없이 부분 문자열로
+    # 색인하기 때문에 한국어 본문도 그대로 검색된다.
+    table = 'blog_post_fts'
+    # 3글자 미만 검색어는 trigram 으로 찾을 수 없어서 1, 2글자 조각을 따로 색인한 테이블에서 찾는다.
+    short_table = 'blog_post_fts_short'
+    min_match_length = 3
+    snippet_tokens = 24
+
+    mark_start = '\x02'
+    mark_end = '\x03'
+
+    available = False
+
+    def is_available(self):
+        # 테이블은 migration 0004_post_fts, 0013_post_fts_short 가 만든다.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE name IN (%s, %s)", [self.table, self.short_table])
+            return cursor.fetchone()[0] == 2
+
+    def is_ready(self):
+        # migrate 전에 process 가 떴어도 테이블이 생기면 바로 쓰도록, 찾을 때까지 매번 확인한다.
+        if connection.vendor != 'sqlite':
+            return False
+        if not self.available:
+            self.available = self.is_available()
+        return self.available
+
+    def search(self, query, limit):
+        query = query.strip()
+        if not query:
+            return []
+
+        snippet = "snippet({}, -1, %s, %s, '…', %s)".format(self.table)
+        params = [self.mark_start, self.mark_end, self.snippet_tokens]
+        if len(query) >= self.min_match_length:
+            # 검색어 전체를 하나의 phrase 로 검색 (기존 __contains 와 같은 의미), bm25 순
+            where = '{} MATCH %s'.format(self.table)
+            order = 'rank'
+            params.append('"{}"'.format(query.replace('"', '""')))
+        elif WORD_RE.fullmatch(query):
+            where = 'rowid IN (SELECT rowid FROM {0} WHERE {0} MATCH %s)'.format(self.short_table)
+            order = 'rowid DESC'
+            params.append('"{}"'.format(query.lower()))
+        else:
+            # 공백이나 문장 부호가 섞인 짧은 검색어
+            pattern = '%{}%'.format(query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+            where = "(title LIKE %s ESCAPE '\\' OR content LIKE %s ESCAPE '\\')"
+            order = 'rowid DESC'
+            params.extend([pattern, pattern])
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid, {} FROM {} WHERE {} ORDER BY {} LIMIT %s'.format(snippet, self.table, where, order),
+                params,
+            )
+            rows = cursor.fetchall()
+
+        return [SearchHit(post_id, self.highlight(text)) for post_id, text in rows]
+
+    def highlight(self, text):
+        return escape(text).replace(self.mark_start, '<mark>').replace(self.mark_end, '</mark>')
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(self.table), [post.pk])
+            cursor.execute(
+                'INSERT INTO {}(rowid, title, content) VALUES (%s, %s, %s)'.format(self.table),
+                [post.pk, post.title, post.content],
+            )
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(self.short_table), [post.pk])
+            cursor.execute(
+                'INSERT INTO {}(rowid, terms) VALUES (%s, %s)'.format(self.short_table),
+                [post.pk, short_terms(post.title, post.content)],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(self.table), [post_id])
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(self.short_table), [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(self.table))
+            cursor.execute(
+                'INSERT INTO {}(rowid, title, content) SELECT id, title, content FROM blog_post'.format(self.table)
+            )
+            cursor.execute('DELETE FROM {}'.format(self.short_table))
+            posts = Post.objects.order_by().values_list('pk', 'title', 'content').iterator(chunk_size=2000)
+            cursor.executemany(
+                'INSERT INTO {}(rowid, terms) VALUES (%s, %s)'.format(self.short_table),
+                ((pk, short_terms(title, content)) for pk, title, content in posts),
+            )
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    # DB 의 FTS 기능 없이 쓰는 in-process 역색인 (blog/inverted_index.py).
+    # 색인 파일은 settings.BLOG_SEARCH_INDEX_PATH 에 저장되고 worker 들이 mmap 으로 공유한다.
+    def __init__(self, path=None):
+        if path is None:
+            path = getattr(settings, 'BLOG_SEARCH_INDEX_PATH', settings.BASE_DIR / '_search' / 'posts.idx')
+        self.index = InvertedIndex(path, getattr(settings, 'BLOG_SEARCH_DELTA_BYTES', 1 << 20))
+
+    def documents(self):
+        return Post.objects.order_by().values_list('pk', 'title', 'content').iterator()
+
+    def ensure_index(self):
+        if not self.index.exists():
+            self.index.build(self.documents(), only_if_missing=True)
+        try:
+            self.index.refresh()
+        except ValueError:
+            # 이전 형식의 색인 파일
+            self.index.build(self.documents())
+
+    def search(self, query, limit):
+        self.ensure_index()
+        return [SearchHit(post_id, None) for post_id, score in self.index.search(query, limit)]
+
+    def index_post(self, post):
+        self.ensure_index()
+        self.index.add(post.pk, post.title, post.content)
+        self.index.flush()
+
+    def remove_post(self, post_id):
+        self.ensure_index()
+        self.index.remove(post_id)
+        self.index.flush()
+
+    def rebuild(self):
+        self.index.build(self.documents())
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+_fallback_backend = ContainsSearchBackend()
+
+
+def get_search_backend():
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', 'blog.search.ContainsSearchBackend')
+    backend = _load_backend(path)
+    if isinstance(backend, SQLiteFTS5Backend) and not backend.is_ready():
+        return _fallback_backend
+    return backend
+
+
+class SearchResults:
+    # Paginator 에 넘기는 검색 결과. 순위가 매겨진 id 목록만 들고 있다가
+    # 현재 페이지에 해당하는 Post 만 DB 에서 가져온다.
+    model = Post
+
+    def __init__(self, hits):
+        self.hits = hits
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        hits = self.hits[index]
+        posts = Post.objects.for_list().in_bulk([hit.post_id for hit in hits])
+        results = []
+        for hit in hits:
+            post = posts.get(hit.post_id)
+            if post is not None:
+                post.search_snippet = hit.snippet
+                results.append(post)
+        return results
+
+
+def search_posts(query):
+    limit = getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 200)
+    return SearchResults(get_search_backend().search(query, limit))
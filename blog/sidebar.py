@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.cache import cache
+from .cache import get_generations
+from .models import Post, Category
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar:{}'
+
+
+def get_sidebar_version():
+    # 'sidebar' cache group 의 generation (blog/signals.py 가 bump 한다)
+    return get_generations(['sidebar'])[0]
+
+
+def get_sidebar_context(version=None):
+    # category 별 글 수는 Category.post_count (blog/counters.py) 에서 읽는다.
+    if version is None:
+        version = get_sidebar_version()
+    key = SIDEBAR_CACHE_KEY.format(version)
+    context = cache.get(key)
+    if context is None:
+        context = {
+            'category_List': list(Category.objects.all()),
+            # 미분류는 counter row 가 없어서 (category_id, created, id) index 로만 센다.
+            'posts_without_category': Post.objects.filter(category__isnull=True).count(),
+        }
+        cache.set(key, context, getattr(settings, 'BLOG_SIDEBAR_CACHE_TIMEOUT', 60 * 60))
+    return context
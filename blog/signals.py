@@ -0,0 +1,317 @@
+from allauth.socialaccount.models import SocialAccount
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .avatars import invalidate_avatar
+from .cache import bump
+from .counters import increment, recount_tags
+from .images import schedule_head_image_variants
+from .models import Post, Category, Tag, Comment, RelatedPost
+from . import sitemaps, tasks
+
+
+@receiver(post_save, sender=SocialAccount)
+@receiver(post_delete, sender=SocialAccount)
+def invalidate_avatar_on_change(sender, instance, **kwargs):
+    invalidate_avatar(instance.user_id)
+
+
+# 무거운 작업은 job queue (blog/tasks.py) 로
+
+@receiver(post_save, sender=Post)
+def render_post_later(sender, instance, **kwargs):
+    # BLOG_TASKS_EAGER 가 아니면 Post.save() 가 렌더링하지 않고 남겨 둔다.
+    if instance.markdown_is_stale():
+        tasks.render_post.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, update_fields=None, **kwargs):
+    # render_post / head_image_variants job 의 저장은 색인할 내용을 바꾸지 않는다.
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    tasks.index_post.enqueue(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    tasks.index_post.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def render_comment_later(sender, instance, **kwargs):
+    tasks.render_comment.enqueue(instance.pk)
+
+
+# page cache (blog/cache.py) 무효화
+# 'sidebar' group 은 sidebar 데이터(blog/sidebar.py)와 sidebar fragment 의 version 이기도 하다.
+
+def category_groups(category_ids):
+    groups = ['category:{}'.format(slug) for slug in
+              Category.objects.filter(pk__in=category_ids).values_list('slug', flat=True)]
+    if None in category_ids:
+        groups.append('category:_none')
+    return groups
+
+
+def tag_groups(tag_slugs):
+    return ['tag:{}'.format(slug) for slug in tag_slugs]
+
+
+def posts_category_groups(post_ids):
+    return category_groups(set(Post.objects.filter(pk__in=post_ids).values_list('category_id', flat=True)))
+
+
+@receiver(post_save, sender=Post)
+def purge_post_pages(sender, instance, created, **kwargs):
+    groups = ['list', 'post:{}'.format(instance.pk)]
+    if created:
+        groups += category_groups({instance.category_id})
+        groups.append('sidebar')
+    else:
+        loaded_category_id = getattr(instance, '_loaded_category_id', instance.category_id)
+        groups += category_groups({loaded_category_id, instance.category_id})
+        groups += tag_groups(instance.tags.values_list('slug', flat=True))
+        if loaded_category_id != instance.category_id:
+            groups.append('sidebar')
+    bump(*groups)
+
+
+@receiver(pre_delete, sender=Post)
+def purge_deleted_post_pages(sender, instance, **kwargs):
+    # tag 연결은 post_delete 때는 이미 지워져 있다.
+    groups = ['list', 'sidebar', 'post:{}'.format(instance.pk)]
+    groups += category_groups({instance.category_id})
+    groups += tag_groups(instance.tags.values_list('slug', flat=True))
+    bump(*groups)
+
+
+def touch_posts(posts):
+    # post 카드(post_list.html 의 fragment cache)는 Post.modified 로 version 을 매긴다.
+    # tag/category 가 바뀌면 그걸 보여주는 post 의 modified 를 갱신한다.
+    posts.update(modified=timezone.now())
+    # update() 는 post_save 를 보내지 않으므로 sitemap 의 lastmod 도 여기서
+    sitemap_changed(posts=posts.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_tagged_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # post.tags.add(...) / remove / clear
+        tags = instance.tags.all() if action == 'pre_clear' else Tag.objects.filter(pk__in=pk_set)
+        post_ids = [instance.pk]
+        groups = tag_groups(tags.values_list('slug', flat=True))
+        # category 목록의 카드에도 tag 가 나온다.
+        groups += category_groups({instance.category_id})
+        instance.modified = timezone.now()
+    else:
+        # tag.post_set.add(...) / remove / clear
+        post_ids = list(instance.post_set.values_list('pk', flat=True)) if action == 'pre_clear' else list(pk_set)
+        groups = tag_groups([instance.slug]) + posts_category_groups(post_ids)
+    touch_posts(Post.objects.filter(pk__in=post_ids))
+    bump('list', *groups, *['post:{}'.format(pk) for pk in post_ids])
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def purge_category_pages(sender, instance, **kwargs):
+    # 이름/개수가 모든 페이지의 sidebar 에 나온다.
+    touch_posts(instance.post_set.all())
+    bump('sidebar', 'list', 'category:{}'.format(instance.slug))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def purge_tag_pages(sender, instance, **kwargs):
+    post_ids = list(instance.post_set.values_list('pk', flat=True))
+    touch_posts(Post.objects.filter(pk__in=post_ids))
+    bump('list', 'tag:{}'.format(instance.slug), *posts_category_groups(post_ids),
+         *['post:{}'.format(pk) for pk in post_ids])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_commented_post_page(sender, instance, **kwargs):
+    bump('post:{}'.format(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def touch_uncommented_post(sender, instance, **kwargs):
+    # 지워진 댓글의 modified_at 은 Last-Modified(PostDetail) 에서 빠지므로 post 쪽을 갱신한다.
+    touch_posts(Post.objects.filter(pk=instance.post_id))
+
+
+@receiver(post_save, sender=Post)
+def resize_head_image(sender, instance, **kwargs):
+    if instance.head_image and instance.head_image_changed():
+        # 요청 안에서 리사이즈하지 않는다. eager 모드에서도 commit 후 background thread 로
+        if tasks.is_eager():
+            schedule_head_image_variants(instance.pk)
+        else:
+            tasks.head_image_variants.enqueue(instance.pk)
+    instance._loaded_head_image = instance.head_image.name
+
+
+# 개수 column (blog/counters.py). 모두 저장/삭제와 같은 transaction 안에서 실행된다.
+
+@receiver(post_save, sender=Post)
+def count_post_category(sender, instance, created, **kwargs):
+    loaded_category_id = None if created else getattr(instance, '_loaded_category_id', instance.category_id)
+    if loaded_category_id != instance.category_id:
+        increment(Category.objects.filter(pk=loaded_category_id), 'post_count', -1)
+        increment(Category.objects.filter(pk=instance.category_id), 'post_count', 1)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    # tag 연결은 m2m_changed 없이 cascade 로 지워진다.
+    increment(Category.objects.filter(pk=instance.category_id), 'post_count', -1)
+    increment(Tag.objects.filter(post=instance), 'post_count', -1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_tagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # clear 된 뒤에는 어떤 tag 였는지 알 수 없다.
+        instance._cleared_tag_ids = [instance.pk] if reverse else list(instance.tags.values_list('pk', flat=True))
+    elif action == 'post_add':
+        # pk_set 에는 실제로 새로 추가된 것만 들어 있다.
+        if reverse:
+            increment(Tag.objects.filter(pk=instance.pk), 'post_count', len(pk_set))
+        else:
+            increment(Tag.objects.filter(pk__in=pk_set), 'post_count', 1)
+    elif action == 'post_remove':
+        # pk_set 에는 원래 연결되지 않았던 것도 들어 있을 수 있어서 다시 센다.
+        recount_tags(Tag.objects.filter(pk=instance.pk) if reverse else Tag.objects.filter(pk__in=pk_set))
+    elif action == 'post_clear':
+        recount_tags(Tag.objects.filter(pk__in=instance.__dict__.pop('_cleared_tag_ids', [])))
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        increment(Post.objects.filter(pk=instance.post_id), 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    increment(Post.objects.filter(pk=instance.post_id), 'comment_count', -1)
+
+
+# 관련 글 (blog/related.py). tag/category 를 가진 글 수가 점수에 들어가므로 바뀐 tag/category 를
+# 가진 모든 글과, feature 를 잃은 글 자신의 목록을 다시 계산한다.
+
+def update_related_later(kind, pks):
+    for pk in set(pks):
+        if pk is not None:
+            tasks.refresh_related.enqueue(kind, pk)
+
+
+@receiver(post_save, sender=Post)
+def relate_post_category(sender, instance, created, **kwargs):
+    loaded_category_id = None if created else getattr(instance, '_loaded_category_id', instance.category_id)
+    if loaded_category_id != instance.category_id:
+        update_related_later('post', [instance.pk])
+        update_related_later('category', [loaded_category_id, instance.category_id])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def relate_tagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.post_set if reverse else instance.tags
+        instance._related_clear_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_related_clear_ids', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if reverse:
+        # tag.post_set.add(...)
+        update_related_later('tag', [instance.pk])
+        update_related_later('post', pk_set)
+    else:
+        update_related_later('post', [instance.pk])
+        update_related_later('tag', pk_set)
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def purge_relating_pages(sender, instance, update_fields=None, **kwargs):
+    # 이 글을 관련 글로 보여주는 상세 페이지 (제목이 나온다)
+    if update_fields is not None and 'title' not in update_fields:
+        return
+    post_ids = RelatedPost.objects.filter(related_id=instance.pk).values_list('post_id', flat=True)
+    bump(*['post:{}'.format(pk) for pk in post_ids])
+
+
+@receiver(pre_delete, sender=Post)
+def remember_related_features(sender, instance, **kwargs):
+    # 지워진 뒤에는 (cascade) 어떤 tag 에 붙어 있었는지 알 수 없다.
+    instance._related_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def relate_deleted_post(sender, instance, **kwargs):
+    update_related_later('tag', instance.__dict__.pop('_related_tag_ids', []))
+    update_related_later('category', [instance.category_id])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Category)
+def remember_related_posts(sender, instance, **kwargs):
+    instance._related_post_ids = list(instance.post_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+def relate_after_delete(sender, instance, **kwargs):
+    update_related_later('post', instance.__dict__.pop('_related_post_ids', []))
+
+
+# sitemap (blog/sitemaps.py). 바뀐 글/tag/category 가 속한 shard 를 표시하고 잠시 뒤 한 번에 다시 쓴다.
+# category / tag 의 lastmod 는 그 글들의 최근 modified 라서 글이 바뀌면 같이 표시한다.
+
+def sitemap_changed(**sections):
+    for section, pks in sections.items():
+        sitemaps.mark_dirty(section, pks)
+    # BLOG_TASKS_EAGER (테스트) 에서는 표시만 한다. `manage.py build_sitemaps` 로 쓴다.
+    if not tasks.is_eager():
+        tasks.update_sitemaps.enqueue(delay=getattr(settings, 'BLOG_SITEMAP_DELAY', 60))
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def sitemap_post_changed(sender, instance, **kwargs):
+    sitemap_changed(
+        posts=[instance.pk],
+        categories=[getattr(instance, '_loaded_category_id', None), instance.category_id],
+        tags=list(instance.tags.values_list('pk', flat=True)),
+    )
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def sitemap_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        pk_set = list((instance.post_set if reverse else instance.tags).values_list('pk', flat=True))
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if reverse:
+        sitemap_changed(tags=[instance.pk])
+    else:
+        sitemap_changed(tags=pk_set)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def sitemap_category_changed(sender, instance, **kwargs):
+    sitemap_changed(categories=[instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def sitemap_tag_changed(sender, instance, **kwargs):
+    sitemap_changed(tags=[instance.pk])
@@ -0,0 +1,194 @@
+"""
+sitemap index + shard 파일 (https://www.sitemaps.org/protocol.html)
+
+    BLOG_SITEMAP_ROOT/sitemap.xml           index (shard 마다 lastmod)
+    BLOG_SITEMAP_ROOT/posts-<n>.xml         Post       pk 가 [n * size, (n + 1) * size) 인 것
+    BLOG_SITEMAP_ROOT/categories-<n>.xml    Category
+    BLOG_SITEMAP_ROOT/tags-<n>.xml          Tag
+
+shard 는 pk 범위로 나누므로 글 하나가 바뀌면 그 글이 속한 shard 만 다시 쓰면 된다.
+blog/signals.py 가 바뀐 shard 의 SitemapShard.generation 을 올리고 (mark_dirty),
+build_sitemaps() 가 파일과 generation 이 다른 shard 만 iterator 로 읽어서 다시 쓴다.
+파일은 임시 파일에 쓴 뒤 rename 하므로 웹 서버가 언제 읽어도 온전한 파일이다.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.encoding import iri_to_uri
+from django.views import static
+
+from .models import Post, Category, Tag, SitemapShard
+
+INDEX_NAME = 'sitemap.xml'
+URLSET_START = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_END = '</urlset>\n'
+INDEX_START = '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_END = '</sitemapindex>\n'
+
+
+def get_shard_size():
+    return getattr(settings, 'BLOG_SITEMAP_SHARD_SIZE', 50000)
+
+
+def get_root():
+    return os.fspath(settings.BLOG_SITEMAP_ROOT)
+
+
+def absolute_url(path):
+    # 한글 slug 는 percent-encoding
+    return escape(iri_to_uri(settings.BLOG_SITE_URL.rstrip('/') + path))
+
+
+def w3c_date(value):
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+# section 마다 (url, lastmod) 를 pk 순서로. 목록을 만들지 않고 iterator 로 읽는다.
+
+def post_urls(start, stop):
+    posts = Post.objects.filter(pk__gte=start, pk__lt=stop).order_by('pk').only('pk', 'modified')
+    for post in posts.iterator(chunk_size=2000):
+        yield post.get_absolute_url(), post.modified
+
+
+def category_urls(start, stop):
+    # lastmod: 그 category 의 가장 최근 글
+    categories = Category.objects.filter(pk__gte=start, pk__lt=stop).order_by('pk').only('pk', 'slug')
+    for category in categories.annotate(lastmod=Max('post__modified')).iterator(chunk_size=2000):
+        yield category.get_absolute_url(), category.lastmod
+
+
+def tag_urls(start, stop):
+    tags = Tag.objects.filter(pk__gte=start, pk__lt=stop).order_by('pk').only('pk', 'slug')
+    for tag in tags.annotate(lastmod=Max('post__modified')).iterator(chunk_size=2000):
+        yield tag.get_absolute_url(), tag.lastmod
+
+
+SECTIONS = {
+    'posts': (Post, post_urls),
+    'categories': (Category, category_urls),
+    'tags': (Tag, tag_urls),
+}
+
+
+def shard_filename(section, number):
+    return '{}-{}.xml'.format(section, number)
+
+
+def mark_dirty(section, pks):
+    # pks 가 속한 shard 를 다시 쓰도록 표시한다. 저장과 같은 transaction 안에서 불린다.
+    size = get_shard_size()
+    for number in sorted({pk // size for pk in pks if pk is not None}):
+        marked = SitemapShard.objects.filter(section=section, number=number).update(generation=F('generation') + 1)
+        if not marked:
+            SitemapShard.objects.get_or_create(section=section, number=number)
+
+
+@contextmanager
+def _temporary_file(path):
+    # 같은 파일을 쓰는 job 이 동시에 돌아도 서로의 임시 파일을 덮어쓰지 않도록 매번 새 이름 (path 옆에)
+    # (file, 임시 파일 경로). 실패하면 임시 파일을 지운다.
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix='.xml')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f, temporary
+    except BaseException:
+        os.remove(temporary)
+        raise
+    # mkstemp 는 0600 으로 만든다. 웹 서버가 읽을 수 있도록
+    os.chmod(temporary, 0o644)
+
+
+def write_shard(section, number):
+    """
+    shard 파일을 다시 쓰고 (URL 수, 가장 최근 lastmod) 를 돌려준다. URL 이 없으면 파일을 지운다.
+    """
+    size = get_shard_size()
+    path = os.path.join(get_root(), shard_filename(section, number))
+    count = 0
+    latest = None
+    with _temporary_file(path) as (f, temporary):
+        f.write(URLSET_START)
+        for url, lastmod in SECTIONS[section][1](number * size, (number + 1) * size):
+            count += 1
+            if lastmod is None:
+                f.write('<url><loc>{}</loc></url>\n'.format(absolute_url(url)))
+                continue
+            latest = lastmod if latest is None else max(latest, lastmod)
+            f.write('<url><loc>{}</loc><lastmod>{}</lastmod></url>\n'.format(absolute_url(url), w3c_date(lastmod)))
+        f.write(URLSET_END)
+    if count:
+        os.replace(temporary, path)
+    else:
+        os.remove(temporary)
+        if os.path.exists(path):
+            os.remove(path)
+    return count, latest
+
+
+def write_index():
+    shards = SitemapShard.objects.filter(urls__gt=0).order_by('section', 'number')
+    base = settings.BLOG_SITE_URL.rstrip('/') + '/sitemaps/'
+    path = os.path.join(get_root(), INDEX_NAME)
+    with _temporary_file(path) as (f, temporary):
+        f.write(INDEX_START)
+        for shard in shards.iterator():
+            lastmod = '<lastmod>{}</lastmod>'.format(w3c_date(shard.lastmod)) if shard.lastmod else ''
+            f.write('<sitemap><loc>{}</loc>{}</sitemap>\n'.format(
+                escape(base + shard_filename(shard.section, shard.number)), lastmod))
+        f.write(INDEX_END)
+    os.replace(temporary, path)
+
+
+def discover_shards():
+    # 전체 다시 쓰기: 지금 있는 pk 범위의 shard 를 모두 표시하고, 범위를 벗어난 shard 는 지운다.
+    size = get_shard_size()
+    for section, (model, urls) in SECTIONS.items():
+        last = model.objects.aggregate(last=Max('pk'))['last']
+        numbers = range(last // size + 1) if last is not None else range(0)
+        mark_dirty(section, [number * size for number in numbers])
+        for shard in SitemapShard.objects.filter(section=section, number__gte=len(numbers)):
+            _remove_shard(shard)
+
+
+def _remove_shard(shard):
+    path = os.path.join(get_root(), shard_filename(shard.section, shard.number))
+    if os.path.exists(path):
+        os.remove(path)
+    shard.delete()
+
+
+def build_sitemaps(full=False):
+    """
+    바뀐 shard 만 다시 쓰고 index 를 갱신한다. 다시 쓴 shard 수를 돌려준다.
+    index 가 아직 없으면 (처음) 전체를 쓴다.
+    """
+    os.makedirs(get_root(), exist_ok=True)
+    index_exists = os.path.exists(os.path.join(get_root(), INDEX_NAME))
+    if full or not index_exists:
+        discover_shards()
+
+    built = 0
+    for shard in SitemapShard.objects.filter(generation__gt=F('built_generation')).order_by('section', 'number'):
+        urls, lastmod = write_shard(shard.section, shard.number)
+        built += 1
+        if urls:
+            # 쓰는 동안 다시 바뀌었으면 generation 이 더 커서 다음 번에 또 쓴다.
+            SitemapShard.objects.filter(pk=shard.pk).update(
+                built_generation=shard.generation, urls=urls, lastmod=lastmod,
+            )
+        else:
+            SitemapShard.objects.filter(pk=shard.pk, generation=shard.generation).delete()
+    if built or not index_exists:
+        write_index()
+    return built
+
+
+def serve(request, path):
+    # 개발 서버용. 운영에서는 웹 서버가 BLOG_SITEMAP_ROOT 를 그대로 내보낸다 (If-Modified-Since 포함).
+    return static.serve(request, path, document_root=get_root())
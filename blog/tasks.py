@@ -0,0 +1,209 @@
+"""
+DB table (blog.models.Job) 에 쌓는 작은 job queue. 외부 broker 없이 `manage.py run_tasks` 가 process pool 로 실행한다.
+
+    @task('blog.render_post', priority=HIGH)
+    def render_post(post_id): ...
+
+    render_post.enqueue(post.pk)
+
+- job 은 저장과 같은 transaction 에 들어가므로 commit 된 뒤에만 worker 에게 보인다.
+- 같은 task + 같은 인자의 pending job 은 하나만 만든다 (글 하나에 re-render 는 하나).
+- 실패하면 BLOG_TASKS_RETRY_DELAY * 2^(시도-1) 초 뒤에 다시, max_attempts 번 실패하면 'failed' 로 남긴다.
+- settings.BLOG_TASKS_EAGER 이면 enqueue 가 바로 실행한다 (테스트). 기본은 queue
+
+cache 무효화와 개수 column 은 저장과 같이 바뀌어야 하고 가벼워서 여기로 보내지 않는다 (blog/signals.py).
+"""
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .images import build_head_image_variants
+from .models import Job, Post, Comment
+from .related import update_related
+from .search import get_search_backend
+from .sitemaps import build_sitemaps
+
+HIGH = 10
+NORMAL = 0
+LOW = -10
+
+_registry = {}
+
+
+def is_eager():
+    return getattr(settings, 'BLOG_TASKS_EAGER', False)
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def key(self, args):
+        return '{}:{}'.format(self.name, ','.join(str(arg) for arg in args))
+
+    def enqueue(self, *args, delay=0):
+        """
+        args 는 JSON 으로 저장된다 (pk 같은 값만).
+        이미 같은 pending job 이 있으면 아무것도 하지 않고 None 을 돌려준다.
+        """
+        if is_eager():
+            self.func(*args)
+            return None
+        key = self.key(args)
+        if Job.objects.filter(key=key, status=Job.PENDING).exists():
+            return None
+        try:
+            with transaction.atomic():
+                return Job.objects.create(
+                    name=self.name, args=list(args), key=key, priority=self.priority,
+                    max_attempts=self.max_attempts, run_after=timezone.now() + timedelta(seconds=delay),
+                )
+        except IntegrityError:
+            # 동시에 다른 요청이 같은 job 을 넣었다.
+            return None
+
+
+def task(name, priority=NORMAL, max_attempts=3):
+    def decorator(func):
+        _registry[name] = Task(func, name, priority, max_attempts)
+        return _registry[name]
+    return decorator
+
+
+def execute(name, args):
+    # worker process 안에서 실행된다. 예외는 run_tasks 가 받아서 retry/fail 로 기록한다.
+    try:
+        return _registry[name](*args)
+    finally:
+        close_old_connections()
+
+
+def claim(limit):
+    """
+    실행할 job 을 최대 limit 개 'running' 으로 바꾸고 돌려준다.
+    여러 worker 가 동시에 돌아도 같은 job 을 두 번 가져가지 않도록 status 를 조건으로 UPDATE 한 뒤
+    이번에 표시한 것(locked_by)만 다시 읽는다. PostgreSQL 등에서는 SELECT ... FOR UPDATE SKIP LOCKED
+    """
+    now = timezone.now()
+    token = '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])[:64]
+    ready = Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by('-priority', 'run_after', 'pk')
+
+    def mark(ids):
+        Job.objects.filter(pk__in=ids, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_by=token, started_at=now, attempts=F('attempts') + 1,
+        )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            mark(ids)
+    else:
+        # SQLite: 읽고 나서 쓰는 transaction 은 다른 process 가 그 사이 commit 하면 바로 'locked' 로 실패한다.
+        # 각각 autocommit 으로 실행하고, 겹친 job 은 status 조건 때문에 한 worker 만 가져간다.
+        ids = list(ready.values_list('pk', flat=True)[:limit])
+        mark(ids)
+    if not ids:
+        return []
+    return list(Job.objects.filter(pk__in=ids, status=Job.RUNNING, locked_by=token).order_by('-priority', 'run_after', 'pk'))
+
+
+def _set_pending(job, run_after, error=''):
+    job.status = Job.PENDING
+    job.run_after = run_after
+    job.locked_by = ''
+    job.last_error = error
+    try:
+        with transaction.atomic():
+            job.save(update_fields=['status', 'run_after', 'locked_by', 'last_error', 'attempts'])
+    except IntegrityError:
+        # 그 사이 같은 key 의 새 job 이 들어왔다. 그 job 이 대신 실행된다.
+        job.delete()
+
+
+def finish(job, error=None):
+    # 성공하면 지운다. 실패하면 backoff 후 다시, 또는 'failed'
+    if error is None:
+        job.delete()
+        return True
+    if job.attempts >= job.max_attempts:
+        job.status = Job.FAILED
+        job.last_error = error
+        job.save(update_fields=['status', 'last_error'])
+    else:
+        delay = getattr(settings, 'BLOG_TASKS_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+        _set_pending(job, timezone.now() + timedelta(seconds=delay), error)
+    return False
+
+
+def release(jobs):
+    # worker 가 중단될 때 실행 중이던 job 을 시도 횟수에 넣지 않고 되돌린다.
+    for job in jobs:
+        job.attempts -= 1
+        _set_pending(job, timezone.now(), job.last_error)
+
+
+def requeue_stale(seconds):
+    # 죽은 worker 가 'running' 으로 남긴 job 은 한 번 실패한 것으로 본다.
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=seconds))
+    jobs = list(stale)
+    for job in jobs:
+        finish(job, 'worker stopped while running the job')
+    return len(jobs)
+
+
+# post 저장 / 댓글 저장 후의 작업들 (blog/signals.py 가 enqueue 한다)
+
+@task('blog.render_post', priority=HIGH)
+def render_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None and post.render_markdown_content():
+        # modified: 카드 fragment cache 의 version (excerpt 가 바뀐다)
+        post.save(update_fields=['content_html', 'content_html_stamp', 'excerpt', 'modified'])
+
+
+@task('blog.index_post')
+def index_post(post_id):
+    # 저장과 삭제 모두. 실행될 때의 상태를 색인한다.
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        get_search_backend().remove_post(post_id)
+    else:
+        get_search_backend().index_post(post)
+
+
+@task('blog.render_comment')
+def render_comment(comment_id):
+    # 댓글 HTML cache 를 미리 채운다 (Comment.render_markdown_bulk)
+    comment = Comment.objects.filter(pk=comment_id).first()
+    if comment is not None:
+        Comment.render_markdown_bulk([comment])
+
+
+@task('blog.head_image_variants', priority=LOW, max_attempts=5)
+def head_image_variants(post_id):
+    build_head_image_variants(post_id)
+
+
+@task('blog.update_related', priority=LOW)
+def refresh_related(kind, pk):
+    # 'post' / 'tag' / 'category' 의 관련 글 목록 (blog/related.py)
+    update_related(kind, pk)
+
+
+@task('blog.update_sitemaps', priority=LOW)
+def update_sitemaps():
+    # 표시된 sitemap shard 만 다시 쓴다 (blog/sitemaps.py)
+    build_sitemaps()
@@ -0,0 +1,12 @@
+from django import template
+
+from blog.images import head_image_context
+
+register = template.Library()
+
+
+@register.inclusion_tag('blog/head_image.html')
+def head_image(post, variant='card', css_class='', alt='', sizes='100vw'):
+    context = head_image_context(post, variant)
+    context.update({'css_class': css_class, 'alt': alt, 'sizes': sizes})
+    return context
@@ -14,10 +14,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.urls import path, include
-from . import views
+from . import views, feeds
 
 urlpatterns = [
     path('search/<str:q>/', views.PostSearch.as_view()),
+    path('feed/<str:fmt>/', feeds.PostFeed.as_view()),
+    path('tag/<str:slug>/feed/<str:fmt>/', feeds.PostFeed.as_view(kind='tag')),
+    path('category/<str:slug>/feed/<str:fmt>/', feeds.PostFeed.as_view(kind='category')),
     path('tag/<str:slug>/', views.PostListByTag.as_view()),
     path('category/<str:slug>/', views.PostListByCategory.as_view()),
     path('<int:pk>/update/', views.PostUpdate.as_view()),
@@ -3,30 +3,51 @@ from .models import Post, Category, Tag, Comment
 from django.views.generic import ListView, DetailView, UpdateView, CreateView, DeleteView
 from .forms import CommentForm
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from .sidebar import get_sidebar_context, get_sidebar_version
+from django.utils.functional import SimpleLazyObject
+from .avatars import get_avatar_urls
+from .search import search_posts
+from .pagination import KeysetPaginationMixin
+from .cache import PageCacheMixin, ConditionalGetMixin
+from .related import related_posts
+from django.db.models import Max
+from my_site_prj.routers import use_primary_db
 
 # Create your views here.
 # 어떠한 model을 template에 담아주는 방식 사용 => FBV(function based view) -> CBV(class based view)
 
-class PostList(ListView):
+class SidebarMixin:
+    # base.html 의 Categories 위젯. fragment cache 가 hit 하면 데이터는 아예 읽지 않는다.
+    def get_context_data(self, **kwargs):
+        context = super(SidebarMixin, self).get_context_data(**kwargs)
+        version = get_sidebar_version()
+        context['sidebar_version'] = version
+        context['sidebar'] = SimpleLazyObject(lambda: get_sidebar_context(version))
+        return context
+
+class PostList(ConditionalGetMixin, PageCacheMixin, SidebarMixin, KeysetPaginationMixin, ListView):
     model = Post
-    paginate_by = 5
+    page_cache_groups = ['list']
+
+    # 목록은 Last-Modified 를 보내지 않는다. 글이 지워지거나 다른 category 로 옮겨도 Max(modified) 는
+    # 바뀌지 않으므로, page cache group 의 generation 으로 만든 ETag 만 쓴다.
 
     # def get_queryset(self):
     #     # 최신순으로 정렬
     #     return Post.objects.order_by('-created')
     # 최신순으로 정렬 - Model에서 Post Meta 선언
 
-    def get_context_data(self, *, object_list = None, **kwargs):
-        context = super(PostList, self).get_context_data(**kwargs)
-        context['category_List'] = Category.objects.all()
-        context['posts_without_category'] = Post.objects.filter(category = None).count()
-        return context
+    def get_queryset(self):
+        return Post.objects.for_list()
 
 class PostSearch(PostList):
+    page_cache_enabled = False
+    conditional_get_enabled = False
+
     def get_queryset(self):
         q = self.kwargs['q']
-        object_list = Post.objects.filter(Q(title__contains=q) | Q(content__contains=q))
+        # Q(title__contains=q) | Q(content__contains=q) 대신 검색 backend (settings.BLOG_SEARCH_BACKEND)
+        object_list = search_posts(q)
         return object_list
 
     def get_context_data(self, *, object_list=None, **kwargs):
@@ -34,18 +55,41 @@ class PostSearch(PostList):
         context['search_info'] = 'Search: "{}"'.format(self.kwargs['q'])
         return context
 
-class PostDetail(DetailView):
+class PostDetail(ConditionalGetMixin, PageCacheMixin, SidebarMixin, DetailView):
     model = Post
+    page_cache_groups = ['post:{pk}']
+
+    def get_last_modified(self):
+        # post 와 댓글의 마지막 수정 시각 (쿼리 1개, template 렌더링 없이)
+        stamps = Post.objects.filter(pk=self.kwargs['pk']).annotate(
+            last_comment=Max('comment__modified_at'),
+        ).values_list('modified', 'last_comment').first()
+        if stamps is None:
+            return None
+        return max(stamp for stamp in stamps if stamp is not None)
+
+    def get_queryset(self):
+        return Post.objects.with_relations()
+
+    def get_comments(self):
+        # 댓글 수와 상관없이 댓글 + 작성자 1 쿼리, 아바타는 캐시 (miss 일 때만 1 쿼리)
+        comments = list(self.object.comment_set.select_related('author').order_by('created_at', 'pk'))
+        avatar_urls = get_avatar_urls(comment.author_id for comment in comments)
+        for comment in comments:
+            comment.avatar_url = avatar_urls[comment.author_id]
+        return Comment.render_markdown_bulk(comments)
 
     def get_context_data(self, *, object_list = None, **kwargs):
         context = super(PostDetail, self).get_context_data(**kwargs)
-        context['category_List'] = Category.objects.all()
-        context['posts_without_category'] = Post.objects.filter(category = None).count()
         context['comment_form'] = CommentForm()
+        context['comments'] = self.get_comments()
+        # 미리 계산된 관련 글 (blog/related.py)
+        context['related_posts'] = related_posts(self.object.pk)
         return context
 
 class PostCreate(LoginRequiredMixin, CreateView):
     model = Post
+    use_primary_db = True
     fields = [
         'title',
         'content',
@@ -65,6 +109,7 @@ class PostCreate(LoginRequiredMixin, CreateView):
 
 class PostUpdate(UpdateView):
     model = Post
+    use_primary_db = True
     fields = [
         'title',
         'content',
@@ -73,45 +118,40 @@ class PostUpdate(UpdateView):
         'tags',
     ]
 
-class PostListByTag(ListView):
+class PostListByTag(ConditionalGetMixin, PageCacheMixin, SidebarMixin, KeysetPaginationMixin, ListView):
+    page_cache_groups = ['tag:{slug}']
+
     def get_queryset(self):
         tag_slug = self.kwargs['slug']
-        tag = Tag.objects.get(slug=tag_slug)
-        
-        return tag.post_set.order_by('-created')
+        self.tag = Tag.objects.get(slug=tag_slug)
+
+        return self.tag.post_set.order_by('-created').for_list()
     
     def get_context_data(self, *, object_list = None, **kwargs):
-        tag_slug = self.kwargs['slug']
         context = super(type(self), self).get_context_data(**kwargs)
-        context['category_List'] = Category.objects.all()
-        context['posts_without_category'] = Post.objects.filter(category = None).count()
-        context['tag'] = Tag.objects.get(slug=tag_slug)
+        context['tag'] = self.tag
         return context
 
-class PostListByCategory(ListView):
+class PostListByCategory(ConditionalGetMixin, PageCacheMixin, SidebarMixin, KeysetPaginationMixin, ListView):
+    page_cache_groups = ['category:{slug}']
 
     def get_queryset(self):
         slug = self.kwargs['slug']
 
         if slug == '_none':
-            category = None
+            self.category = None
         else:
-            category = Category.objects.get(slug = slug)
+            self.category = Category.objects.get(slug = slug)
 
-        return Post.objects.filter(category=category).order_by('-created')
+        return Post.objects.filter(category=self.category).order_by('-created').for_list()
 
     def get_context_data(self, *, object_list = None, **kwargs):
         context = super(type(self), self).get_context_data(**kwargs)
-        context['category_List'] = Category.objects.all()
-        context['posts_without_category'] = Post.objects.filter(category=None).count()
-
-        slug = self.kwargs['slug']
 
-        if slug == '_none':
+        if self.category is None:
             context['category'] = '미분류'
         else:
-            category = Category.objects.get(slug = slug)
-            context['category'] = category
+            context['category'] = self.category
 
         # context['title'] = 'Blog - {}'.format(category.name)
         return context
@@ -137,6 +177,7 @@ class PostListByCategory(ListView):
     #     }
     # )
 
+@use_primary_db
 def new_comment(request, pk):
     post = Post.objects.get(pk=pk)
     
@@ -153,6 +194,7 @@ def new_comment(request, pk):
 
 class CommentUpdate(UpdateView):
     model = Comment
+    use_primary_db = True
     form_class = CommentForm
 
     def get_object(self, queryset=None):
@@ -177,6 +219,7 @@ class CommentUpdate(UpdateView):
 #         return post.get_absolute_url() + '#comment-list'
 
 #### Comment Delete 함수지향(FBV)
+@use_primary_db
 def delete_comment(request, pk):
     comment = Comment.objects.get(pk=pk)
 
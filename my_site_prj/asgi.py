@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_site_prj.settings')
+# 읽기 view 의 async 버전 (blog/async_urls.py) 은 BLOG_ASYNC_VIEWS=1 로 켠다.
+# 기본은 ASGI 에서도 동기 view (`manage.py benchmark_asgi` 로 비교)
 
 application = get_asgi_application()
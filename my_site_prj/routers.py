@@ -0,0 +1,104 @@
+"""
+읽기 전용 replica 로 조회를 보내는 router 와 middleware.
+
+    DATABASES            'default' 는 primary, settings.DATABASE_REPLICAS 의 alias 들은 replica
+    DATABASE_ROUTERS     ['my_site_prj.routers.PrimaryReplicaRouter']
+    MIDDLEWARE           'my_site_prj.routers.ReplicaRoutingMiddleware'
+
+요청 밖(management command, worker 등)과 transaction 안의 조회는 항상 primary 로 간다.
+요청 안에서는 GET/HEAD 의 조회만 replica 로 가고, 아래의 경우 그 요청은 primary 에 고정된다.
+  - POST 등 쓰기 요청, 또는 use_primary_db 가 표시된 view (PostCreate, new_comment, ...)
+  - 요청 중에 한 번이라도 쓰기를 한 뒤
+  - 최근에 쓰기를 한 사용자 (DATABASE_REPLICA_STICKY_SECONDS 동안 cookie) : read-your-writes
+"""
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+STICKY_COOKIE = 'blog_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing', default=PRIMARY)
+
+
+def routing_state():
+    return _state.get()
+
+
+def use_primary_db(view):
+    # function view 용. class view 는 use_primary_db = True 속성을 둔다.
+    view.use_primary_db = True
+    return view
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if _state.get() != REPLICA or not replicas or connections['default'].in_atomic_block:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # 이 요청의 이후 조회는 방금 쓴 내용을 봐야 한다.
+        if _state.get() == REPLICA:
+            _state.set(PRIMARY)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica 는 primary 의 복사본이라 같은 데이터
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def start(self, request):
+        use_replica = request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+        return _state.set(REPLICA if use_replica else PRIMARY)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # replica 가 따라올 때까지 이 사용자의 조회는 primary 로
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        if getattr(view, 'use_primary_db', False):
+            _state.set(PRIMARY)
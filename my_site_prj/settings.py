@@ -13,6 +13,8 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+from my_site_prj.db import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,11 +56,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'my_site_prj.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,13 +91,38 @@ WSGI_APPLICATION = 'my_site_prj.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# 환경 변수(DATABASE_URL 등)로 고른다. 설명은 my_site_prj/db.py
+# 기본값은 BASE_DIR/db.sqlite3 (WAL + busy_timeout)
+
 DATABASES = {
+    'default': database_config(BASE_DIR),
+    **replica_configs(BASE_DIR),
+}
+
+# 읽기 전용 replica 로 조회를 보낸다 (my_site_prj/routers.py)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['my_site_prj.routers.PrimaryReplicaRouter']
+# 쓰기를 한 사용자는 이 시간 동안 primary 에서 읽는다 (replica 지연보다 길게)
+DATABASE_REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# 기본은 local-memory, DJANGO_CACHE_DIR 을 주면 process 끼리 공유되는 file-based cache
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'my_site_prj',
     }
 }
 
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -152,4 +181,63 @@ MEDIA_URL = '/media/'
 MARKDOWNX_MEDIA_PATH = datetime.now().strftime('markdownx/%Y/%m/%d')
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+# Blog rendering cache
+# 댓글 HTML 은 (comment pk, modified_at) 단위로 캐시된다.
+BLOG_COMMENT_HTML_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Blog page cache (로그인하지 않은 사용자의 목록/상세 페이지)
+BLOG_PAGE_CACHE_TIMEOUT = 60 * 10
+
+# RSS / Atom / JSON feed (blog/feeds.py) 의 글 수
+BLOG_FEED_ITEMS = 20
+
+# sitemap (blog/sitemaps.py): build_sitemaps / job queue 가 파일로 쓰고, 운영에서는 웹 서버가
+# BLOG_SITEMAP_ROOT 를 /sitemap.xml, /sitemaps/ 로 그대로 내보낸다.
+BLOG_SITE_URL = os.environ.get('BLOG_SITE_URL', 'http://localhost:8000')
+BLOG_SITEMAP_ROOT = BASE_DIR / '_sitemaps'
+# 파일 하나의 최대 URL 수 (sitemaps.org 제한)
+BLOG_SITEMAP_SHARD_SIZE = 50000
+# 글이 바뀐 뒤 이 초 동안 모아서 한 번에 다시 쓴다.
+BLOG_SITEMAP_DELAY = 60
+
+# Blog search
+# SQLite 에서는 FTS5(trigram) 역색인, 다른 DB 에서는 ContainsSearchBackend 로 대체된다.
+# DB 의 FTS 를 쓸 수 없으면 'blog.search.InvertedIndexBackend' (파일 색인, mmap 공유)
+BLOG_SEARCH_BACKEND = 'blog.search.SQLiteFTS5Backend'
+BLOG_SEARCH_MAX_RESULTS = 200
+BLOG_SEARCH_INDEX_PATH = BASE_DIR / '_search' / 'posts.idx'
+# InvertedIndexBackend: 저장할 때는 변경만 '<색인>.delta' 에 덧붙이고, 이 크기를 넘으면 색인에 합쳐서 새로 쓴다.
+BLOG_SEARCH_DELTA_BYTES = 1 << 20
+
+# 저장 후 작업(Markdown 렌더링, 검색 색인, 이미지 variant)의 job queue (blog/tasks.py)
+# blog.models.Job 에 쌓이고 `manage.py run_tasks` 가 실행한다.
+# BLOG_TASKS_EAGER=1 이면 worker 없이 요청 안에서 바로 실행한다 (테스트, worker 를 띄우지 않는 개발 환경).
+# worker 의 cache 무효화가 웹 process 에 보여야 하므로 process 마다 따로인 cache(locmem) 에서는 eager 가 기본이다
+# (blog/checks.py 가 확인한다).
+BLOG_TASKS_EAGER = os.environ.get(
+    'BLOG_TASKS_EAGER', '1' if CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.DummyCache')) else '0',
+) == '1'
+BLOG_TASKS_PROCESSES = int(os.environ.get('BLOG_TASKS_PROCESSES', 2))
+# 실패한 job 은 이 초 * 2^(시도-1) 뒤에 다시
+BLOG_TASKS_RETRY_DELAY = 30
+# BLOG_TASKS_EAGER 일 때 Post.head_image 의 리사이즈/WebP variant 를 만드는 background thread 수
+BLOG_IMAGE_WORKERS = 2
+
+# 상세 페이지의 관련 글 (blog/related.py): post 마다 미리 계산해 두는 개수
+BLOG_RELATED_POSTS = 5
+# 이보다 많은 글에 붙은 tag/category 는 관련도 계산에서 뺀다.
+BLOG_RELATED_MAX_POSTINGS = 1000
+# 0 보다 크면 본문의 TF-IDF 상위 단어도 feature 로 쓴다 (tag 가 바뀔 때마다 전체를 다시 계산)
+BLOG_RELATED_CONTENT_TERMS = 0
+
+# 요청 metrics (blog/middleware.py): 이 비율의 요청만 Server-Timing header + 'blog.metrics' log
+BLOG_METRICS_SAMPLE_RATE = float(os.environ.get('BLOG_METRICS_SAMPLE_RATE', '0.01'))
+BLOG_METRICS_SERVER_TIMING = True
+
+# ASGI 용 async 읽기 view (blog/async_views.py). 기본은 꺼져 있다 (BLOG_ASYNC_VIEWS=1 로 켠다).
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS') == '1'
+# async view 가 동시에 실행하는 ORM 호출 / Markdown 렌더링 thread 수
+BLOG_ASYNC_DB_WORKERS = int(os.environ.get('BLOG_ASYNC_DB_WORKERS', 4))
+BLOG_MARKDOWN_WORKERS = 2
+
 LOGIN_REDIRECT_URL = '/blog/'
\ No newline at end of file
@@ -18,12 +18,18 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from blog import sitemaps
+
 urlpatterns = [
-    path('blog/', include('blog.urls')),
+    # ASGI(my_site_prj/asgi.py)에서는 읽기 view 가 async 버전 (blog/async_views.py)
+    path('blog/', include('blog.async_urls' if settings.BLOG_ASYNC_VIEWS else 'blog.urls')),
     path('admin/', admin.site.urls),
     path('markdownx/', include('markdownx.urls')),
     path('accounts/', include('allauth.urls')),
     # 위의 식 또는 url(r'^markdownx/', include('markdownx.urls')),
+    # 운영에서는 웹 서버가 BLOG_SITEMAP_ROOT 를 직접 내보낸다.
+    path('sitemap.xml', sitemaps.serve, {'path': sitemaps.INDEX_NAME}),
+    path('sitemaps/<str:path>', sitemaps.serve),
     path('', include('basecamp.urls')),
 ]
 